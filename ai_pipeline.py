@@ -0,0 +1,171 @@
+# ai_pipeline.py
+# Asynchronous AI image generation: requests run on a private asyncio loop thread so
+# callers publish the SVG fallback right away and swap the AI image in when it lands.
+import asyncio, base64, io, threading, time, traceback
+from concurrent.futures import CancelledError, TimeoutError as FutureTimeout
+from datetime import date
+
+from config import AI_DEADLINE_SECONDS, AI_MAX_CONCURRENCY, AI_MODEL, AI_SIZE
+from config import AI_PREFETCH_MIN_INTERVAL, AI_PREFETCH_DAILY_BUDGET
+from metrics import METRICS
+
+
+def validate_png(data: bytes) -> tuple[int, int]:
+    """Fully decode an image (Pillow); returns its size, or raises ValueError unless it is a sound PNG."""
+    from PIL import Image
+
+    try:
+        with Image.open(io.BytesIO(data)) as im:
+            im.load()
+            fmt, size = im.format, im.size
+    except Exception as e:
+        raise ValueError(f"undecodable image: {e}") from e
+    if fmt != "PNG":
+        raise ValueError(f"expected a PNG, got {fmt}")
+    return size
+
+
+class AIPipeline:
+    """
+    submit(key, prompt, on_result) starts a generation unless that key is already in
+    flight. Each request gets `deadline` seconds; at most `concurrency` run at once.
+    on_result(key, png_bytes) runs on the loop thread, so keep it short and thread-safe;
+    it only ever sees images that validate_png() decoded.
+    Point OPENAI_BASE_URL at ai_stub.py to exercise this without the real API.
+    """
+
+    def __init__(self, deadline: float = AI_DEADLINE_SECONDS, concurrency: int = AI_MAX_CONCURRENCY):
+        self.deadline = deadline
+        self._sem = asyncio.Semaphore(concurrency)
+        self._client = None
+        self._jobs = {}  # key → concurrent.futures.Future
+        self._lock = threading.Lock()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="ai-pipeline", daemon=True)
+        self._thread.start()
+
+    def _get_client(self):
+        if self._client is None:
+            from openai import AsyncOpenAI
+
+            self._client = AsyncOpenAI(timeout=self.deadline, max_retries=0)
+        return self._client
+
+    async def _generate(self, key: str, prompt: str, on_result) -> bytes:
+        async with self._sem:
+            METRICS.incr("ai_requests")
+            try:
+                with METRICS.span("ai.request"):
+                    r = await asyncio.wait_for(
+                        self._get_client().images.generate(model=AI_MODEL, prompt=prompt, size=AI_SIZE),
+                        self.deadline,
+                    )
+                png = base64.b64decode(r.data[0].b64_json)
+                # Never cache or publish an image the display can't decode
+                await asyncio.get_running_loop().run_in_executor(None, validate_png, png)
+            except asyncio.CancelledError:
+                raise  # superseded, not failed
+            except Exception:
+                METRICS.incr("ai_failures")  # includes missed deadlines and bad images
+                raise
+        if on_result:
+            try:
+                on_result(key, png)
+            except Exception:
+                traceback.print_exc()
+        return png
+
+    def submit(self, key: str, prompt: str, on_result=None, supersede: bool = True):
+        """
+        Start (or join) the generation for `key`. With supersede=True, in-flight jobs for
+        other keys are cancelled first — the board moved on, their cats won't be shown.
+        """
+        stale = []
+        with self._lock:
+            if supersede:
+                stale = [self._jobs.pop(other) for other in list(self._jobs) if other != key]
+            fut = self._jobs.get(key)
+            if fut is None or fut.done():
+                fut = asyncio.run_coroutine_threadsafe(self._generate(key, prompt, on_result), self._loop)
+                fut.add_done_callback(lambda f, k=key: self._forget(k, f))
+                self._jobs[key] = fut
+        # Outside the lock: cancel() runs done callbacks (_forget) synchronously
+        for old in stale:
+            old.cancel()
+        return fut
+
+    def _forget(self, key: str, fut):
+        with self._lock:
+            if self._jobs.get(key) is fut:
+                del self._jobs[key]
+
+    def pending(self, key: str) -> bool:
+        with self._lock:
+            return key in self._jobs
+
+    def wait(self, fut, timeout: float | None = None) -> bytes | None:
+        """PNG bytes, or None if the job failed, was cancelled or missed the deadline."""
+        try:
+            return fut.result(timeout if timeout is not None else self.deadline + 1.0)
+        except (CancelledError, FutureTimeout):
+            return None
+        except Exception as e:
+            print(f"AI generation failed: {e}")
+            return None
+
+    def cancel_all(self):
+        with self._lock:
+            jobs = list(self._jobs.values())
+            self._jobs.clear()
+        for fut in jobs:
+            fut.cancel()
+
+    def close(self):
+        self.cancel_all()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=2.0)
+
+
+class Prefetcher:
+    """
+    Rate- and budget-limited background requests for images the board is likely to need
+    next. offer() starts at most one job per call, no sooner than `min_interval` seconds
+    after the previous one and no more than `daily_budget` per calendar day. Prefetch
+    jobs never supersede others; a foreground submit() for another key still cancels them.
+    """
+
+    def __init__(
+        self,
+        pipeline: AIPipeline,
+        min_interval: float = AI_PREFETCH_MIN_INTERVAL,
+        daily_budget: int = AI_PREFETCH_DAILY_BUDGET,
+    ):
+        self.pipeline = pipeline
+        self.min_interval = min_interval
+        self.daily_budget = daily_budget
+        self.spent = 0  # requests started today
+        self._day = None
+        self._last = None  # monotonic time of the last request
+
+    def allowed(self) -> bool:
+        if self._day != date.today():
+            self._day, self.spent = date.today(), 0
+        if self.spent >= self.daily_budget:
+            return False
+        return self._last is None or time.monotonic() - self._last >= self.min_interval
+
+    def offer(self, candidates, on_result=None) -> str | None:
+        """
+        candidates: (key, prompt) pairs, most likely first, already filtered against the
+        cache. Returns the key that was started, or None (nothing to do, or over limits).
+        """
+        if not self.allowed():
+            return None
+        for key, prompt in candidates:
+            if self.pipeline.pending(key):
+                continue
+            self.pipeline.submit(key, prompt, on_result, supersede=False)
+            self._last = time.monotonic()
+            self.spent += 1
+            return key
+        return None
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# ai_stub.py
+# Local stand-in for the OpenAI images endpoint, for exercising ai_pipeline.py offline:
+#   python3 ai_stub.py --delay 5 &
+#   OPENAI_API_KEY=stub OPENAI_BASE_URL=http://127.0.0.1:8765/v1 python3 generate_cat.py --test A=dom
+import argparse, base64, json, struct, time, zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+
+def grey_png(width: int = 64, height: int = 64, level: int = 128) -> bytes:
+    """A valid 8-bit greyscale PNG, built with zlib so no image library is needed."""
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+
+    rows = (b"\0" + bytes([level]) * width) * height  # filter byte 0 (none) per row
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", ihdr) + chunk(b"IDAT", zlib.compress(rows)) + chunk(b"IEND", b"")
+
+
+# Grey PNG, used when no --png is given
+_TINY_PNG = grey_png()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    png = _TINY_PNG
+    delay = 0.0
+    fail = False
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)) or 0)
+        if not self.path.rstrip("/").endswith("/images/generations"):
+            self.send_error(404)
+            return
+        prompt = json.loads(body or b"{}").get("prompt", "")
+        print(f"[stub] {prompt[:70]}… (delay {self.delay}s)")
+        time.sleep(self.delay)
+        if self.fail:
+            self.send_error(500, "stub failure")
+            return
+        out = json.dumps({"created": int(time.time()), "data": [{"b64_json": base64.b64encode(self.png).decode()}]})
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(out)))
+        self.end_headers()
+        self.wfile.write(out.encode())
+
+    def log_message(self, *args):
+        pass
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Stub OpenAI images endpoint")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--delay", type=float, default=0.0, help="Seconds to sleep per request")
+    ap.add_argument("--png", help="PNG file to return (default: 64×64 grey)")
+    ap.add_argument("--fail", action="store_true", help="Answer every request with HTTP 500")
+    args = ap.parse_args()
+
+    StubHandler.delay = args.delay
+    StubHandler.fail = args.fail
+    if args.png:
+        StubHandler.png = Path(args.png).read_bytes()
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), StubHandler)
+    print(f"Stub images endpoint on http://127.0.0.1:{args.port}/v1")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
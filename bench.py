@@ -0,0 +1,418 @@
+#!/usr/bin/env python3
+# bench.py
+# Timings and memory high-water marks for the hot paths, on seeded inputs and a
+# simulated board (hardware.SimBackend), so numbers are comparable between commits
+# and machines. Runs in a scratch directory: real output/ and adc_lut.json are not
+# touched (tiles decode with config's default thresholds).
+#   python3 bench.py                          # everything → output/bench.json
+#   python3 bench.py --only snapshot,cycle --repeat 50
+#   python3 bench.py --save-baseline          # keep this run as the reference
+#   python3 bench.py --baseline               # compare; exit 1 on regressions
+import argparse, contextlib, gc, io, json, math, os, platform, random, shutil, subprocess, sys, tempfile, time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+from config import BENCH_RESULTS_PATH, BENCH_BASELINE_PATH, BENCH_TOLERANCE, ROUNDS, SIM_SPI_LATENCY_US
+
+HERE = Path(__file__).resolve().parent
+SLOTS = ["A", "B", "C", "D", "E"]
+MEM_RUNS = 3  # runs traced by tracemalloc (slow) for the memory high-water mark
+MEM_FLOOR_KIB = 16  # peak growth below this is noise, not a regression
+
+BENCHES = {}  # name → context manager yielding (op, calls per op[, untimed setup before each op])
+
+
+def bench(name: str):
+    def register(fn):
+        BENCHES[name] = contextlib.contextmanager(fn)
+        return fn
+
+    return register
+
+
+# ---------- Inputs ----------
+def random_live(rng: random.Random) -> dict:
+    """A board reading as snapshot() returns it: any allele, right / wrong / undecoded tile."""
+    from config import TILE_ID_BY_SLOT
+
+    live = {}
+    for s in SLOTS:
+        allele = rng.choice(["dom", "rec", "dom", "rec", None, "invalid"])
+        tile = None
+        if allele in ("dom", "rec"):
+            other = "rec" if allele == "dom" else "dom"
+            tile = rng.choice([TILE_ID_BY_SLOT[s][allele], TILE_ID_BY_SLOT[s][other], None])
+        live[s] = {"allele": allele, "volts": 0.0, "tile_id": tile}
+    return live
+
+
+def random_labels(rng: random.Random, n: int) -> list[tuple[dict, str]]:
+    from genotype import phenotype_labels
+
+    out = []
+    for _ in range(n):
+        round_cfg = rng.choice(ROUNDS)
+        out.append((phenotype_labels(round_cfg, rng.randrange(32)), f"Customer: {round_cfg['customer']}"))
+    return out
+
+
+def seated_sim(seed: int, latency_us: float, slots: str = "ABCD"):
+    from hardware import SimBackend
+
+    rng = random.Random(seed)
+    sim = SimBackend(spi_latency_us=latency_us, seed=seed)
+    for s in slots:
+        sim.insert(s, rng.choice(["dom", "rec"]))
+    return sim
+
+
+# ---------- Benchmarks ----------
+@bench("snapshot")
+def _snapshot(args):
+    from sensors import GeneBoard
+
+    gb = GeneBoard(seated_sim(args.seed, args.spi_latency_us))
+    try:
+        yield gb.snapshot, 1
+    finally:
+        gb.close()
+
+
+@bench("decode_tile_id")
+def _decode_tile_id(args):
+    from sensors import GeneBoard
+
+    rng = random.Random(args.seed)
+    gb = GeneBoard(seated_sim(args.seed, 0))
+    inputs = [(rng.choice(SLOTS), rng.uniform(0.0, 3.3)) for _ in range(1000)]
+
+    def op():
+        for slot, volts in inputs:
+            gb.decode_tile_id(slot, volts)
+
+    try:
+        yield op, len(inputs)
+    finally:
+        gb.close()
+
+
+@bench("compute_matches")
+def _compute_matches(args):
+    from generate_cat import compute_matches
+
+    rng = random.Random(args.seed)
+    boards = [random_live(rng) for _ in range(256)]
+    target = {s: rng.choice(["dom", "rec"]) for s in SLOTS}
+
+    def op():
+        for live in boards:
+            compute_matches(live, target)
+
+    yield op, len(boards)
+
+
+@bench("compose_svg")
+def _compose_svg(args):
+    from compose_svg import compose_svg
+
+    inputs = random_labels(random.Random(args.seed), 32)
+
+    def op():
+        for labels, caption in inputs:
+            compose_svg(labels, caption)
+
+    yield op, len(inputs)
+
+
+@bench("fallback_svg")
+def _fallback_svg(args):
+    from generate_cat import fallback_svg
+
+    inputs = random_labels(random.Random(args.seed), 32)
+
+    def op():
+        for labels, caption in inputs:
+            fallback_svg(labels, caption)
+
+    yield op, len(inputs)
+
+
+@bench("save_svg_png")
+def _save_svg_png(args):
+    import generate_cat
+
+    generate_cat.rasterizer.get()  # ImportError without cairosvg: skipped
+    labels, caption = random_labels(random.Random(args.seed), 1)[0]
+    svg = generate_cat.fallback_svg(labels, caption)  # what the "svg" render backend rasterizes
+    d = Path("bench")
+    d.mkdir(exist_ok=True)
+    yield lambda: generate_cat.save_svg_png(svg, d / "cat.svg", d / "cat.png", d / "cat_display.png"), 1
+
+
+@bench("render")
+def _render(args):
+    # A render-cache miss as render_cat does it: RENDER_BACKEND, display PNG and frame
+    import generate_cat
+
+    inputs = random_labels(random.Random(args.seed), 8)
+    d = Path("bench")
+    d.mkdir(exist_ok=True)
+    paths = {name: d / f"cat.{name}" for name in ("svg", "png", "display_png", "frame")}
+
+    def op():
+        for labels, caption in inputs:
+            generate_cat.render_phenotype(labels, caption, paths)
+
+    yield op, len(inputs)
+
+
+@bench("display_load")
+def _display_load(args):
+    with contextlib.redirect_stdout(io.StringIO()):  # pygame's import banner
+        import display_cat
+    import pygame
+
+    # A busy full-size image (PNG decode cost depends on content)
+    rng = random.Random(args.seed)
+    surf = pygame.Surface((800, 480))
+    for _ in range(400):
+        color = [rng.randrange(256) for _ in range(3)]
+        surf.fill(color, (rng.randrange(800), rng.randrange(480), rng.randrange(8, 160), rng.randrange(8, 160)))
+    path = Path("bench") / "display.png"
+    path.parent.mkdir(exist_ok=True)
+    pygame.image.save(surf, str(path))
+    yield lambda: display_cat.load_scaled(path), 1
+
+
+def _test_run(args):
+    # One `generate_cat.py --test ...` run in-process, on a seeded board
+    import generate_cat
+
+    rng = random.Random(args.seed)
+    argv = ["generate_cat.py", "--test"] + [f"{s}={rng.choice(['dom', 'rec'])}" for s in "ABCD"]
+
+    def op():
+        saved = sys.argv
+        sys.argv = argv
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                generate_cat.main()
+        finally:
+            sys.argv = saved
+
+    return op
+
+
+def _clear_render_cache():
+    from config import RENDER_CACHE_DIR
+
+    shutil.rmtree(RENDER_CACHE_DIR, ignore_errors=True)
+
+
+@bench("cycle")
+def _cycle(args):
+    # Same cat every run, so the render cache is emptied (untimed) first: this times the render
+    yield _test_run(args), 1, _clear_render_cache
+
+
+@bench("cycle_cached")
+def _cycle_cached(args):
+    # Every run after the first is a render-cache hit (a file copy), as on a quiet board
+    yield _test_run(args), 1
+
+
+# ---------- Measuring ----------
+def percentile(values: list[float], p: float) -> float:
+    """Nearest-rank percentile of sorted values."""
+    return values[max(0, min(len(values) - 1, math.ceil(p / 100 * len(values)) - 1))]
+
+
+def measure(op, calls: int, repeat: int, warmup: int, setup=None) -> dict:
+    """
+    Per-call microseconds over `repeat` timed runs (after `warmup` untimed ones; the very
+    first run is reported separately as `first_us`, it includes lazy imports and cold
+    caches), then the tracemalloc peak of a few more runs. setup(), if given, runs
+    untimed before every run.
+    """
+    setup = setup or (lambda: None)
+    setup()
+    t0 = time.perf_counter_ns()
+    op()
+    first = time.perf_counter_ns() - t0
+    for _ in range(warmup):
+        setup()
+        op()
+    times = []
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            setup()
+            t0 = time.perf_counter_ns()
+            op()
+            times.append(time.perf_counter_ns() - t0)
+    finally:
+        gc.enable()
+    times = sorted(t / 1000 / calls for t in times)
+
+    tracemalloc.start()
+    try:
+        for _ in range(min(repeat, MEM_RUNS)):
+            setup()
+            op()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "calls_per_run": calls,
+        "runs": repeat,
+        "first_us": round(first / 1000 / calls, 2),
+        "min_us": round(times[0], 2),
+        "p50_us": round(percentile(times, 50), 2),
+        "p90_us": round(percentile(times, 90), 2),
+        "p99_us": round(percentile(times, 99), 2),
+        "max_us": round(times[-1], 2),
+        "mean_us": round(sum(times) / len(times), 2),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def run_benches(names: list[str], args) -> dict:
+    results = {}
+    for name in names:
+        try:
+            with BENCHES[name](args) as (op, calls, *setup):
+                results[name] = measure(op, calls, args.repeat, args.warmup, *setup)
+        except Exception as e:
+            # Missing optional dependency (cairosvg, pygame, …) or a broken path: recorded, not fatal
+            results[name] = {"skipped": f"{type(e).__name__}: {e}"}
+        print(format_row(name, results[name]), flush=True)
+    return results
+
+
+def machine_info(args) -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True, text=True, timeout=10
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = ""
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit or None,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "spi_latency_us": args.spi_latency_us,
+    }
+
+
+def max_rss_kib() -> int | None:
+    try:
+        import resource
+    except ImportError:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # KiB on Linux
+
+
+# ---------- Reporting ----------
+def format_row(name: str, r: dict, change: str = "") -> str:
+    if "skipped" in r:
+        return f"  {name:<16} skipped ({r['skipped']})"
+    return (
+        f"  {name:<16} p50 {r['p50_us']:>10.2f} µs  p90 {r['p90_us']:>10.2f}  p99 {r['p99_us']:>10.2f}"
+        f"  peak {r['peak_kib']:>9.1f} KiB{change}"
+    )
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Regressions against a baseline run: p50 or peak memory more than `tolerance` above it."""
+    regressions = []
+    old_results = baseline.get("results", {})
+    for name, r in results.items():
+        old = old_results.get(name)
+        if "skipped" in r or not old or "skipped" in old:
+            continue
+        if old["p50_us"] and r["p50_us"] > old["p50_us"] * (1 + tolerance):
+            regressions.append(f"{name}: p50 {old['p50_us']} → {r['p50_us']} µs")
+        if r["peak_kib"] > old["peak_kib"] * (1 + tolerance) and r["peak_kib"] - old["peak_kib"] > MEM_FLOOR_KIB:
+            regressions.append(f"{name}: peak {old['peak_kib']} → {r['peak_kib']} KiB")
+    return regressions
+
+
+def print_comparison(results: dict, baseline: dict):
+    print(f"vs baseline {baseline.get('meta', {}).get('commit')} ({baseline.get('meta', {}).get('timestamp')}):")
+    for name, r in results.items():
+        old = baseline.get("results", {}).get(name)
+        change = ""
+        if old and "skipped" not in old and "skipped" not in r and old["p50_us"]:
+            change = f"  ({(r['p50_us'] / old['p50_us'] - 1) * 100:+.0f}% p50)"
+        print(format_row(name, r, change))
+
+
+# ---------- Main ----------
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark sensing, decoding, rendering and full cycles")
+    ap.add_argument("--only", help=f"Comma-separated subset of: {', '.join(BENCHES)}")
+    ap.add_argument("--repeat", type=int, default=30, help="Timed runs per benchmark")
+    ap.add_argument("--warmup", type=int, default=3, help="Untimed runs before timing")
+    ap.add_argument("--seed", type=int, default=1, help="Seed for every generated input")
+    ap.add_argument("--spi-latency-us", type=float, default=SIM_SPI_LATENCY_US, help="Simulated MCP3008 transfer time")
+    ap.add_argument("--out", default=BENCH_RESULTS_PATH, help="Results JSON")
+    ap.add_argument("--baseline", nargs="?", const=BENCH_BASELINE_PATH, help="Compare against this baseline JSON")
+    ap.add_argument("--save-baseline", nargs="?", const=BENCH_BASELINE_PATH, help="Also store results as baseline")
+    ap.add_argument("--tolerance", type=float, default=BENCH_TOLERANCE, help="Allowed slowdown / growth (0.25 = 25%%)")
+    args = ap.parse_args()
+
+    names = [n.strip() for n in args.only.split(",")] if args.only else list(BENCHES)
+    unknown = [n for n in names if n not in BENCHES]
+    if unknown:
+        ap.error(f"unknown benchmark(s): {', '.join(unknown)}")
+    if args.repeat < 1:
+        ap.error("--repeat must be at least 1")
+    out = Path(args.out).resolve()
+    baseline_path = Path(args.baseline).resolve() if args.baseline else None
+    save_path = Path(args.save_baseline).resolve() if args.save_baseline else None
+
+    os.environ.pop("OPENAI_API_KEY", None)  # never time (or pay for) network calls
+    random.seed(args.seed)  # new-round targets in the cycle benchmark
+    if str(HERE) not in sys.path:
+        sys.path.insert(0, str(HERE))
+    home = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="kitty-bench-") as scratch:
+        os.chdir(scratch)
+        try:
+            print(f"Benchmarks (seed {args.seed}, {args.repeat} runs, per-call times):")
+            results = run_benches(names, args)
+        finally:
+            os.chdir(home)
+
+    doc = {"meta": {**machine_info(args), "max_rss_kib": max_rss_kib()}, "results": results}
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(doc, indent=2))
+    print(f"✅ Saved → {out}")
+    if save_path:
+        save_path.write_text(json.dumps(doc, indent=2))
+        print(f"✅ Baseline → {save_path}")
+
+    if baseline_path:
+        try:
+            baseline = json.loads(baseline_path.read_text())
+        except (OSError, ValueError) as e:
+            print(f"No usable baseline at {baseline_path}: {e}")
+            raise SystemExit(2)
+        print_comparison(results, baseline)
+        regressions = compare(results, baseline, args.tolerance)
+        for line in regressions:
+            print(f"⚠️  Regression: {line}")
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
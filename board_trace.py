@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+# board_trace.py
+# Record what GeneBoard sees from the hardware (Hall pin levels and MCP3008 raw codes,
+# timestamped) into a compact binary trace, and replay it into the sampler → decode →
+# render pipeline at 1×, N× or as fast as possible, e.g. to study debounce behaviour,
+# render churn and latency of a busy real session away from the board.
+#   python3 board_trace.py record session.ktr --seconds 600      # real board (or --sim)
+#   python3 board_trace.py info session.ktr
+#   python3 board_trace.py replay session.ktr --speed 10 --render  # --speed 0: as fast as possible
+#   python3 generate_cat.py --daemon --record session.ktr    # record a live session
+import argparse, contextlib, io, json, math, os, queue, random, struct, tempfile, threading, time
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+
+from config import HALL_PINS, ADC_CHANNEL, ADC_OVERSAMPLE, BOARD_MAX_RETRIES, SAMPLER_RATE_HZ
+from hardware import SimBackend
+
+# File: header, metadata JSON, then fixed-size events
+MAGIC = b"KTRC"
+VERSION = 1
+_HEADER = struct.Struct("<4sBI")  # magic, version, metadata length
+_EVENT = struct.Struct("<IBH")  # µs since the previous event, tag, value
+ADC_TAG = 0x80  # | MCP3008 channel → raw code; smaller tags are BCM pins → Hall level
+GAP_TAG = 0xFF  # no event, only time (gaps beyond the 32-bit µs delta)
+_MAX_DT = 0xFFFFFFFF
+_ADC_QUEUE = ADC_OVERSAMPLE * (BOARD_MAX_RETRIES + 1)  # codes kept per channel for replay reads
+
+
+# ---------- Recording ----------
+class TraceRecorder:
+    """
+    Backend wrapper (see hardware.py): passes everything through to `backend` and logs
+    every Hall level change it observes (polled reads and edge callbacks) and every
+    ADC code read. LEDs are not recorded. Other attributes (e.g. SimBackend.insert)
+    reach the wrapped backend.
+    """
+
+    def __init__(self, backend, path: str | Path):
+        self.inner = backend
+        self.path = Path(path)
+        self.events = 0
+        self._levels = {}
+        self._lock = threading.Lock()
+        self._file = open(self.path, "wb", buffering=64 * 1024)
+        meta = json.dumps(
+            {"started": datetime.now().isoformat(), "hall_pins": HALL_PINS, "adc_channel": ADC_CHANNEL}
+        ).encode("utf-8")
+        self._file.write(_HEADER.pack(MAGIC, VERSION, len(meta)) + meta)
+        self._t0 = self._last = time.monotonic_ns() // 1000
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+    def _log(self, tag: int, value: int):
+        with self._lock:
+            now = time.monotonic_ns() // 1000
+            dt = now - self._last
+            while dt > _MAX_DT:
+                self._file.write(_EVENT.pack(_MAX_DT, GAP_TAG, 0))
+                dt -= _MAX_DT
+            self._file.write(_EVENT.pack(dt, tag, value))
+            self._last = now
+            self.events += 1
+
+    def _level(self, pin: int, level: int):
+        if self._levels.get(pin) != level:
+            self._levels[pin] = level
+            self._log(pin, level)
+
+    # ----- Backend interface -----
+    def setup_input(self, pin: int):
+        self.inner.setup_input(pin)
+        self._level(pin, self.inner.read(pin))
+
+    def setup_output(self, pin: int, level: int):
+        self.inner.setup_output(pin, level)
+
+    def read(self, pin: int) -> int:
+        level = self.inner.read(pin)
+        self._level(pin, level)
+        return level
+
+    def write(self, pin: int, level: int):
+        self.inner.write(pin, level)
+
+    def watch(self, pin: int, callback):
+        def on_edge(p):
+            self.read(p)  # timestamp the new level at the edge, not at the next poll
+            callback(p)
+
+        self.inner.watch(pin, on_edge)
+
+    def unwatch(self, pin: int):
+        self.inner.unwatch(pin)
+
+    def xfer(self, cmd: list[int]) -> list[int]:
+        r = self.inner.xfer(cmd)
+        self._log(ADC_TAG | ((cmd[1] >> 4) & 7), ((r[1] & 3) << 8) | r[2])
+        return r
+
+    def close(self):
+        try:
+            with self._lock:
+                self._file.close()
+        finally:
+            self.inner.close()
+
+
+def read_trace(path: str | Path) -> tuple[dict, list[tuple[float, int, int]]]:
+    """(metadata, [(seconds since start, tag, value), ...]); a torn final event is ignored."""
+    data = Path(path).read_bytes()
+    magic, version, n = _HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path}: not a version {VERSION} board trace")
+    meta = json.loads(data[_HEADER.size : _HEADER.size + n])
+    body = memoryview(data)[_HEADER.size + n :]
+    body = body[: len(body) - len(body) % _EVENT.size]
+    events = []
+    t = 0
+    for dt, tag, value in _EVENT.iter_unpack(body):
+        t += dt
+        if tag != GAP_TAG:
+            events.append((t / 1e6, tag, value))
+    return meta, events
+
+
+def trace_info(path: str | Path) -> dict:
+    meta, events = read_trace(path)
+    hall = sum(1 for _, tag, _ in events if not tag & ADC_TAG)
+    return {
+        "started": meta.get("started"),
+        "seconds": round(events[-1][0], 3) if events else 0.0,
+        "events": len(events),
+        "hall_changes": hall,
+        "adc_codes": len(events) - hall,
+        "bytes": os.path.getsize(path),
+    }
+
+
+# ---------- Replay ----------
+class TraceBackend(SimBackend):
+    """
+    SimBackend whose pins and ADC follow a recorded trace: advance(t) applies every event
+    up to trace time t (Hall changes fire edge callbacks like the real GPIO would); ADC
+    reads return the recorded codes of that channel in order, so oversampling sees the
+    recorded noise, and repeat the last code once they run out.
+    """
+
+    def __init__(self, path: str | Path):
+        super().__init__(noise_codes=0, spi_latency_us=0)
+        self.meta, self.events = read_trace(path)
+        if self.meta.get("hall_pins") != json.loads(json.dumps(HALL_PINS)):
+            print(f"⚠️  {path} was recorded with different HALL_PINS; replaying by pin number")
+        self.duration = self.events[-1][0] if self.events else 0.0
+        self.pos = 0
+        self.last_hall_t = 0.0  # trace time of the latest applied Hall change
+        self._adc = {}
+        self.advance(0.0)
+
+    @property
+    def done(self) -> bool:
+        return self.pos >= len(self.events)
+
+    def next_time(self) -> float | None:
+        return self.events[self.pos][0] if self.pos < len(self.events) else None
+
+    def advance(self, t: float):
+        events = self.events
+        while self.pos < len(events) and events[self.pos][0] <= t:
+            et, tag, value = events[self.pos]
+            self.pos += 1
+            if tag & ADC_TAG:
+                with self._lock:
+                    self._adc.setdefault(tag & 0x7F, deque(maxlen=_ADC_QUEUE)).append(value)
+            else:
+                self.last_hall_t = et
+                self._set_pin(tag, value)
+
+    def xfer(self, cmd: list[int]) -> list[int]:
+        self.transfers += 1
+        ch = (cmd[1] >> 4) & 7
+        with self._lock:
+            pending = self._adc.get(ch)
+            if pending:
+                self.codes[ch] = pending.popleft()
+            code = self.codes.get(ch, 0)
+        return [0, (code >> 8) & 3, code & 0xFF]
+
+    def start_playback(self, speed: float = 1.0) -> threading.Thread:
+        """Apply events on a thread at `speed` × real time; returns the (daemon) thread."""
+
+        def run():
+            t0 = time.monotonic()
+            while not self.done:
+                time.sleep(max(0.0, t0 + self.next_time() / speed - time.monotonic()))
+                self.advance((time.monotonic() - t0) * speed)
+
+        thread = threading.Thread(target=run, name="trace-playback", daemon=True)
+        thread.start()
+        return thread
+
+
+def _summary(values: list[float]) -> dict:
+    if not values:
+        return {"n": 0}
+    v = sorted(values)
+
+    def ms(q: float) -> float:
+        return round(v[min(len(v) - 1, int(q * len(v)))] * 1000, 2)
+
+    return {"n": len(v), "p50_ms": ms(0.5), "p90_ms": ms(0.9), "p99_ms": ms(0.99), "max_ms": ms(1.0)}
+
+
+def replay(path: str | Path, speed: float = 1.0, render: bool = False, rate_hz: float = SAMPLER_RATE_HZ) -> dict:
+    """
+    Feed a trace through GeneBoard and generate_cat.run_cycle as the daemon would: every
+    change of the sampled board state runs a cycle (LEDs, progress; with render=True
+    also the cat whenever the genotype changed, published to output/ like --test).
+    speed > 0 runs the background sampler at rate_hz against a real-time (× speed)
+    playback; speed 0 samples every 1/rate_hz of trace time as fast as possible.
+    Game state and history are left alone, and AI requests are off.
+    Returns change / render counts, detection lag (trace time) and cycle costs (wall).
+    """
+    os.environ.pop("OPENAI_API_KEY", None)  # load tests must not spend API budget
+    import generate_cat
+    from genotype import genotype_mask
+    from sampler import compact_state
+    from state_store import StateStore
+
+    backend = TraceBackend(path)
+    gb = generate_cat.open_board(backend)
+    stats = {"changes": 0, "renders": 0}
+    lags, cycles, renders = [], [], []
+    rendered = None
+
+    with tempfile.TemporaryDirectory(prefix="kitty-replay-") as scratch:
+        state, round_cfg = generate_cat.load_round_state(StateStore(Path(scratch) / "game_state.json"))
+
+        def handle(live: dict, lag: float):
+            nonlocal rendered
+            key = (round_cfg["id"], genotype_mask(generate_cat.allele_genotype(live)))
+            do_render = render and key != rendered
+            t0 = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                generate_cat.run_cycle(gb, state, round_cfg, live, render=do_render, wait_ai=False, kind=None)
+            cost = time.perf_counter() - t0
+            stats["changes"] += 1
+            lags.append(lag)
+            cycles.append(cost)
+            if do_render:
+                stats["renders"] += 1
+                renders.append(cost)
+                rendered = key
+
+        wall0 = time.perf_counter()
+        try:
+            if speed > 0:
+                changes = queue.Queue()
+                # Polled: edge debounce timers run in wall time, so they'd skew sped-up lag figures
+                sampler = gb.start_sampler(rate_hz=rate_hz * speed, edge=False)
+                start = time.monotonic()
+                sampler.subscribe(
+                    lambda t, live, prev: changes.put((live, max(0.0, (t - start) * speed - backend.last_hall_t)))
+                )
+                player = backend.start_playback(speed)
+                # After the last event, give the sampler a few periods to report the final state
+                linger = 3 / (rate_hz * speed) + 0.1
+                ended = None
+                while ended is None or time.monotonic() < ended + linger or not changes.empty():
+                    if ended is None and not player.is_alive():
+                        ended = time.monotonic()
+                    try:
+                        handle(*changes.get(timeout=0.05))
+                    except queue.Empty:
+                        pass
+            else:
+                period = 1.0 / rate_hz
+                t, last = 0.0, None
+                while True:
+                    backend.advance(t)
+                    live = gb.read_with_retries(interval=0)
+                    compact = compact_state(live)
+                    if compact != last:
+                        handle(live, t - backend.last_hall_t)
+                        last = compact
+                    if backend.done:
+                        break
+                    # Nothing happens between events: jump to the first sample at or after the next one
+                    t = max(t + period, math.ceil(backend.next_time() / period) * period)
+        finally:
+            generate_cat.close_board(gb)
+        wall = time.perf_counter() - wall0
+
+    minutes = max(backend.duration, 1e-9) / 60
+    return {
+        "trace": str(path),
+        "speed": speed or "max",
+        "trace_seconds": round(backend.duration, 3),
+        "wall_seconds": round(wall, 3),
+        **stats,
+        "renders_per_minute": round(stats["renders"] / minutes, 2),
+        "detect_lag": _summary(lags),
+        "cycle": _summary(cycles),
+        "render": _summary(renders),
+    }
+
+
+# ---------- Synthetic sessions ----------
+def busy_script(seconds: float, seed: int = 0) -> list[tuple]:
+    """SimBackend.play() script of hurried play: a tile seated, pulled or swapped every ~0.5 s."""
+    rng = random.Random(seed)
+    script, seated, t = [], set(), 0.0
+    while t < seconds:
+        slot = rng.choice(list(HALL_PINS))
+        if slot in seated and rng.random() < 0.4:
+            script.append((t, "remove", slot, rng.randrange(4)))
+            seated.discard(slot)
+        else:
+            script.append((t, "insert", slot, rng.choice(["dom", "rec"]), None, rng.randrange(4)))
+            seated.add(slot)
+        t += rng.expovariate(2.0)
+    return script
+
+
+# ---------- Main ----------
+def main():
+    ap = argparse.ArgumentParser(description="Record and replay raw board traces")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    rec = sub.add_parser("record", help="Record the board while the sampler runs")
+    rec.add_argument("path")
+    rec.add_argument("--seconds", type=float, help="Stop after this long (default: Ctrl-C)")
+    rec.add_argument("--sim", action="store_true", help="Record scripted busy play on a simulated board")
+    rec.add_argument("--seed", type=int, default=0, help="Seed for --sim")
+    sub.add_parser("info", help="Summarize a trace").add_argument("path")
+    rep = sub.add_parser("replay", help="Replay a trace into the pipeline")
+    rep.add_argument("path")
+    rep.add_argument("--speed", type=float, default=1.0, help="Playback speed; 0 = as fast as possible")
+    rep.add_argument("--rate", type=float, default=SAMPLER_RATE_HZ, help="Board samples per second of trace time")
+    rep.add_argument("--render", action="store_true", help="Also render (and publish) the cat on genotype changes")
+    args = ap.parse_args()
+
+    if args.cmd == "info":
+        print(json.dumps(trace_info(args.path), indent=2))
+        return
+    if args.cmd == "replay":
+        if args.speed < 0 or args.rate <= 0:
+            ap.error("--speed must be >= 0 and --rate > 0")
+        print(json.dumps(replay(args.path, args.speed, args.render, args.rate), indent=2))
+        return
+
+    from sensors import GeneBoard
+
+    if args.sim:
+        inner = SimBackend(seed=args.seed)
+    else:
+        from hardware import PiBackend
+
+        inner = PiBackend()
+    recorder = TraceRecorder(inner, args.path)
+    gb = GeneBoard(recorder)
+    gb.start_sampler()
+    seconds = args.seconds if args.seconds is not None else (30.0 if args.sim else None)
+    if args.sim:
+        inner.play(busy_script(seconds, args.seed))
+    print(f"⏺  Recording → {args.path}" + (f" for {seconds:g}s" if seconds else " (Ctrl-C to stop)"))
+    try:
+        threading.Event().wait(seconds)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        gb.close()
+    print(json.dumps(trace_info(args.path), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# calibration.py
+# Pogo tile ID calibration: raw ADC code distributions → compiled per-slot lookup tables.
+import argparse, base64, itertools, json
+from pathlib import Path
+from statistics import median
+
+from config import ADC_ID_THRESHOLDS, ADC_LUT_PATH, ADC_HYSTERESIS_CODES, TILE_ID_BY_SLOT
+
+UNCERTAIN = "uncertain"
+ADC_CODES = 1024  # MCP3008 is 10-bit
+
+# Table byte values: 0 = no tile, 1..N = labels[i - 1], 255 = uncertain
+_UNCERTAIN = 255
+
+
+def _adc_volts(raw: int) -> float:
+    return 3.3 * raw / 1023.0
+
+
+def compile_from_thresholds(thresholds: list[tuple[float, str]]) -> tuple[bytes, list[str]]:
+    """Bake the legacy ADC_ID_THRESHOLDS walk (volts <= max_v + 0.03) into a table."""
+    table = sorted(thresholds, key=lambda x: x[0])
+    labels = [label for _, label in table]
+    out = bytearray(ADC_CODES)
+    for code in range(ADC_CODES):
+        volts = _adc_volts(code)
+        for i, (max_v, _label) in enumerate(table):
+            if volts <= (max_v + 0.03):
+                out[code] = i + 1
+                break
+    return bytes(out), labels
+
+
+def compile_from_samples(
+    samples: dict[str, list[int]], hysteresis: int = ADC_HYSTERESIS_CODES
+) -> tuple[bytes, list[str]]:
+    """
+    samples: tile label → raw codes observed while that tile was seated.
+    Neighbouring tiles (ordered by median code) split at the midpoint of their medians;
+    codes within ±hysteresis of a split, or where the observed ranges overlap, decode
+    as UNCERTAIN. Everything below the lowest split belongs to the lowest tile (as with
+    the threshold table); codes above the highest tile's max + hysteresis mean no tile.
+    """
+    stats = sorted(((median(codes), min(codes), max(codes), label) for label, codes in samples.items() if codes))
+    labels = [label for *_, label in stats]
+    out = bytearray(ADC_CODES)
+    lo = 0
+    for i, (med, _mn, mx, _label) in enumerate(stats):
+        if i + 1 < len(stats):
+            hi = int((med + stats[i + 1][0]) // 2)
+        else:
+            hi = min(ADC_CODES - 1, mx + hysteresis)
+        for code in range(lo, hi + 1):
+            out[code] = i + 1
+        lo = hi + 1
+    for (med_a, _, mx_a, _), (med_b, mn_b, _, _) in zip(stats, stats[1:]):
+        mid = int((med_a + med_b) // 2)
+        guard = range(max(0, mid - hysteresis), min(ADC_CODES - 1, mid + hysteresis) + 1)
+        overlap = range(mn_b, mx_a + 1)  # empty unless the observed ranges overlap
+        for code in itertools.chain(guard, overlap):
+            out[code] = _UNCERTAIN
+    return bytes(out), labels
+
+
+class TileDecoder:
+    """O(1) raw-code → tile label decoding from compiled per-slot tables."""
+
+    def __init__(self, tables: dict[str, tuple[bytes, list[str]]], stats: dict | None = None):
+        self.tables = tables
+        self.stats = stats or {}
+        # Expand to per-code Python objects once so decode() is a single index
+        self._lut = {}
+        for slot, (table, labels) in tables.items():
+            names = [None] + labels + [None] * (254 - len(labels)) + [UNCERTAIN]
+            self._lut[slot] = [names[b] for b in table]
+
+    @classmethod
+    def load(cls, path: str | Path = ADC_LUT_PATH) -> "TileDecoder":
+        """Calibrated tables from `path` where present, ADC_ID_THRESHOLDS for the rest."""
+        tables = {slot: compile_from_thresholds(th) for slot, th in ADC_ID_THRESHOLDS.items()}
+        stats = {}
+        path = Path(path)
+        if path.exists():
+            data = json.loads(path.read_text())
+            for slot, entry in data.get("slots", {}).items():
+                tables[slot] = (base64.b64decode(entry["table"]), entry["labels"])
+                if "stats" in entry:
+                    stats[slot] = entry["stats"]
+        return cls(tables, stats)
+
+    def decode(self, slot: str, raw: int) -> str | None:
+        lut = self._lut.get(slot)
+        return lut[raw] if lut else None
+
+    def save(self, path: str | Path = ADC_LUT_PATH):
+        data = {"slots": {}}
+        for slot, (table, labels) in sorted(self.tables.items()):
+            data["slots"][slot] = {"labels": labels, "table": base64.b64encode(table).decode("ascii")}
+            if slot in self.stats:
+                data["slots"][slot]["stats"] = self.stats[slot]
+        Path(path).write_text(json.dumps(data, indent=2))
+
+
+# ---------- Interactive calibration ----------
+def main():
+    from sensors import GeneBoard
+
+    ap = argparse.ArgumentParser(description="Calibrate pogo tile IDs and write the ADC lookup table")
+    ap.add_argument("slots", nargs="*", default=list(TILE_ID_BY_SLOT), help="Slots to calibrate (default: all)")
+    ap.add_argument("--seconds", type=int, default=3, help="Sampling time per tile")
+    ap.add_argument("--out", default=ADC_LUT_PATH, help="Lookup table file")
+    args = ap.parse_args()
+
+    decoder = TileDecoder.load(args.out)
+    gb = GeneBoard()
+    try:
+        for slot in args.slots:
+            slot = slot.upper()
+            samples = {}
+            for label in TILE_ID_BY_SLOT[slot].values():
+                input(f"Seat tile {label} in slot {slot}, then press Enter …")
+                samples[label] = gb.calibrate_adc(slot, args.seconds)
+            table, labels = compile_from_samples(samples)
+            decoder.tables[slot] = (table, labels)
+            decoder.stats[slot] = {
+                label: {"median": median(c), "min": min(c), "max": max(c), "n": len(c)} for label, c in samples.items()
+            }
+            n_unc = table.count(_UNCERTAIN)
+            print(f"Slot {slot}: {' < '.join(labels)}  ({n_unc} uncertain codes)")
+    finally:
+        gb.close()
+    decoder.save(args.out)
+    print(f"✅ Saved → {args.out}")
+
+
+if __name__ == "__main__":
+    main()
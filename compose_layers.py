@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+compose_layers.py — raster layer engine for the Kitty CRISPR cat.
+
+Each trait fragment from compose_svg.layer_fragments() is rasterized once per
+distinct key (shape + colour, caption text, …) at the target resolution, cropped
+to its visible box and cached as premultiplied RGBA. A cat is then just an
+alpha-composite of cached layers with NumPy — no SVG parse per render.
+
+After the first render, render_incremental() recomposites only the box covered
+by layers whose key changed (e.g. just the tail when slot C flips) and reports
+that box so the display can refresh just the dirty rectangle.
+
+Needs numpy + Pillow on top of cairosvg.
+"""
+
+import io
+
+import numpy as np
+from PIL import Image
+
+from compose_svg import CANVAS_W, CANVAS_H, layer_fragments
+
+
+def rasterize_fragment(fragment: str, width: int, height: int) -> tuple[int, int, np.ndarray] | None:
+    """
+    Fragment → (y0, x0, premultiplied RGBA uint8 crop) at width × height, or None if
+    nothing is visible. Fragments use canvas coordinates; cairosvg scales to the target.
+    """
+    import cairosvg
+
+    svg = (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{CANVAS_W}" height="{CANVAS_H}" '
+        f'viewBox="0 0 {CANVAS_W} {CANVAS_H}">{fragment}</svg>'
+    )
+    png = cairosvg.svg2png(bytestring=svg.encode("utf-8"), output_width=width, output_height=height)
+    rgba = np.asarray(Image.open(io.BytesIO(png)).convert("RGBA"), dtype=np.uint16)
+    alpha = rgba[..., 3]
+    ys, xs = np.nonzero(alpha)
+    if ys.size == 0:
+        return None
+    y0, y1, x0, x1 = ys.min(), ys.max() + 1, xs.min(), xs.max() + 1
+    crop = rgba[y0:y1, x0:x1]
+    a = crop[..., 3:4]
+    crop[..., :3] = (crop[..., :3] * a + 127) // 255  # premultiply once, at cache time
+    return int(y0), int(x0), crop.astype(np.uint8)
+
+
+class LayerCompositor:
+    """Caches rasterized layers for one output size and composites cats from them."""
+
+    def __init__(self, width: int = CANVAS_W, height: int = CANVAS_H):
+        self.width = width
+        self.height = height
+        self._layers = {}  # layer key → (y0, x0, premultiplied RGBA) | None
+        # Last composite, for render_incremental()
+        self._prev_keys = None
+        self._prev_layers = None
+        self._canvas = None
+
+    def layer(self, key: tuple, fragment: str):
+        if key not in self._layers:
+            self._layers[key] = rasterize_fragment(fragment, self.width, self.height) if fragment else None
+        return self._layers[key]
+
+    def layers_for(self, trait_values: dict, caption: str) -> tuple[list, list]:
+        frags = layer_fragments(trait_values, caption)
+        return [key for key, _ in frags], [self.layer(key, fragment) for key, fragment in frags]
+
+    @staticmethod
+    def bbox(layer) -> tuple[int, int, int, int] | None:
+        if layer is None:
+            return None
+        y0, x0, src = layer
+        return x0, y0, x0 + src.shape[1], y0 + src.shape[0]
+
+    @staticmethod
+    def union(a, b):
+        if a is None or b is None:
+            return a or b
+        return min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])
+
+    @staticmethod
+    def blend(out: np.ndarray, layer, box: tuple[int, int, int, int] | None = None):
+        """Composite one cached layer over `out` (uint16 RGB), optionally clipped to box=(x0, y0, x1, y1)."""
+        if layer is None:
+            return
+        y0, x0, src = layer
+        y1, x1 = y0 + src.shape[0], x0 + src.shape[1]
+        if box is not None:
+            bx0, by0, bx1, by1 = box
+            cy0, cx0, cy1, cx1 = max(y0, by0), max(x0, bx0), min(y1, by1), min(x1, bx1)
+            if cy0 >= cy1 or cx0 >= cx1:
+                return
+            src = src[cy0 - y0 : cy1 - y0, cx0 - x0 : cx1 - x0]
+            y0, x0, y1, x1 = cy0, cx0, cy1, cx1
+        dst = out[y0:y1, x0:x1]
+        a = src[..., 3:4].astype(np.uint16)
+        dst *= 255 - a
+        dst += 127
+        dst //= 255
+        dst += src[..., :3]
+
+    def render(self, trait_values: dict, caption: str) -> np.ndarray:
+        """Composite the cat into an H × W × 3 uint8 RGB array."""
+        keys, layers = self.layers_for(trait_values, caption)
+        out = np.zeros((self.height, self.width, 3), dtype=np.uint16)
+        for layer in layers:
+            self.blend(out, layer)
+        self._prev_keys, self._prev_layers, self._canvas = keys, layers, out
+        return out.astype(np.uint8)
+
+    @property
+    def has_previous(self) -> bool:
+        return self._canvas is not None
+
+    def forget(self):
+        """Drop the previous composite (e.g. when something else was published in between)."""
+        self._prev_keys = self._prev_layers = self._canvas = None
+
+    def render_incremental(self, trait_values: dict, caption: str) -> tuple[np.ndarray, tuple | None]:
+        """
+        Like render(), but relative to the previous composite: only the union of the
+        old and new boxes of layers whose key changed is recomposited (all layers,
+        clipped to that box, so stacking order is preserved).
+        Returns (image, dirty box (x0, y0, x1, y1) or None when nothing changed).
+        """
+        keys, layers = self.layers_for(trait_values, caption)
+        if self._canvas is None or len(keys) != len(self._prev_keys):
+            return self.render(trait_values, caption), (0, 0, self.width, self.height)
+        box = None
+        for i, key in enumerate(keys):
+            if key != self._prev_keys[i]:
+                box = self.union(box, self.union(self.bbox(self._prev_layers[i]), self.bbox(layers[i])))
+        if box is not None:
+            x0, y0, x1, y1 = box
+            self._canvas[y0:y1, x0:x1] = 0
+            for layer in layers:
+                self.blend(self._canvas, layer, box)
+        self._prev_keys, self._prev_layers = keys, layers
+        return self._canvas.astype(np.uint8), box
+
+    def render_png(self, trait_values: dict, caption: str, path, incremental: bool = False) -> tuple | None:
+        """Write the cat as PNG; returns the dirty box (full canvas unless incremental)."""
+        if incremental:
+            img, box = self.render_incremental(trait_values, caption)
+        else:
+            img, box = self.render(trait_values, caption), (0, 0, self.width, self.height)
+        Image.fromarray(img, "RGB").save(path)
+        return box
+
+
+if __name__ == "__main__":
+    # Example standalone test: second render reuses every cached layer
+    import time
+    from pathlib import Path
+
+    traits = {"A": "green eyes", "B": "long fur", "C": "pointy ears", "D": "long tail", "E": "orange coat"}
+    comp = LayerCompositor()
+    Path("output").mkdir(exist_ok=True)
+    for label in ("cold", "warm"):
+        t0 = time.perf_counter()
+        comp.render_png(traits, "Test Cat — Layer Compose", "output/test_cat_layers.png")
+        print(f"{label}: {(time.perf_counter() - t0) * 1000:.1f} ms")
+    # One tile swap: only the tail's box is recomposited
+    swapped = dict(traits, D="short tail")
+    box = comp.render_png(swapped, "Test Cat — Layer Compose", "output/test_cat_layers.png", incremental=True)
+    print(f"tail swap: dirty box {box}")
+    print("✅ Wrote output/test_cat_layers.png")
@@ -10,16 +10,26 @@ from pathlib import Path
 
 CANVAS_W, CANVAS_H = 800, 480
 
-# Basic color + shape libraries for each trait
+# Basic color + shape libraries for each drawn feature
 COLORS = {
-    "body": {"Striped": "#d68a39", "Gray": "#999999"},
-    "eyes": {"Green Eyes": "#54ff75", "Blue Eyes": "#3a7bff"},
-    "pattern": {"Spotted": "spots", "Solid": "solid"},
+    "body": {
+        "orange": "#d68a39",
+        "gray": "#999999",
+        "grey": "#999999",
+        "cream": "#eedcb3",
+        "charcoal": "#4a4a4a",
+        "black": "#262626",
+        "white": "#eeeeee",
+        "beige": "#cdb891",
+    },
+    "eyes": {"green": "#54ff75", "blue": "#3a7bff", "amber": "#ffb000", "gold": "#e6c200", "red": "#d81e1e"},
 }
 
 TAILS = {
     "Long Tail": "<rect x='515' y='270' width='70' height='15' rx='7' ry='7' fill='{color}'/>",
     "Short Tail": "<rect x='515' y='270' width='30' height='15' rx='7' ry='7' fill='{color}'/>",
+    "Curved Tail": "<path d='M515,280 Q585,285 570,215' stroke='{color}' stroke-width='14' fill='none' "
+    "stroke-linecap='round'/>",
 }
 
 EARS = {
@@ -31,60 +41,176 @@ EARS = {
         <ellipse cx='430' cy='145' rx='10' ry='15' fill='{color}'/>""",
 }
 
+PATTERNS = {
+    "solid": "",
+    "spots": "".join(
+        f"<circle cx='{x}' cy='{y}' r='8' fill='rgba(0,0,0,0.2)'/>"
+        for x, y in [(370, 310), (420, 320), (390, 340), (410, 285)]
+    ),
+    "stripes": "".join(
+        f"<rect x='{x}' y='245' width='10' height='60' rx='5' fill='rgba(0,0,0,0.25)'/>" for x in (340, 375, 410, 445)
+    ),
+    "smoky": "<ellipse cx='400' cy='320' rx='110' ry='45' fill='rgba(0,0,0,0.3)'/>",
+}
+
+# Phenotype label words → drawn feature value; first match wins, in order. A label is
+# drawn only if it names the feature's body part (e.g. "tail") and one of its words.
+FEATURES = {
+    "eyes": ({"eyes"}, list(COLORS["eyes"].items())),
+    "ears": (
+        {"ears", "ear"},
+        [("rounded", "Rounded Ears"), ("pointy", "Pointy Ears"), ("tall", "Pointy Ears"), ("tufted", "Pointy Ears")],
+    ),
+    "tail": (
+        {"tail"},
+        [
+            ("curved", "Curved Tail"),
+            ("short", "Short Tail"),
+            ("puff", "Short Tail"),
+            ("long", "Long Tail"),
+            ("plume", "Long Tail"),
+            ("straight", "Long Tail"),
+        ],
+    ),
+    "body": ({"fur", "coat", "color"}, list(COLORS["body"].items())),
+    "pattern": (
+        {"pattern", "coat", "color", "fur", "patches", "streaks"},
+        [
+            ("striped", "stripes"),
+            ("tabby", "stripes"),
+            ("spotted", "spots"),
+            ("patches", "spots"),
+            ("smoky", "smoky"),
+            ("solid", "solid"),
+        ],
+    ),
+}
+DEFAULTS = {"eyes": "#66ccff", "ears": "Pointy Ears", "tail": "Short Tail", "body": "#aaaaaa", "pattern": "solid"}
+
+
+def resolve_feature(label: str) -> tuple[str, str] | None:
+    """(feature, value) drawn for one phenotype label (e.g. "short puff tail" → tail), or None."""
+    words = set(label.lower().replace("-", " ").split())
+    for feature, (parts, values) in FEATURES.items():
+        if words & parts:
+            for word, value in values:
+                if word in words:
+                    return feature, value
+    return None
+
+
+def resolve_features(trait_values: dict) -> tuple[dict, dict]:
+    """
+    Slot → label map (as resolve_trait_labels gives it, in any slot order) →
+    (feature → value, slot → label of traits the cat can't draw). Undrawn traits get a
+    caption chip instead, so every trait of the round shows up in the picture.
+    """
+    features, chips = dict(DEFAULTS), {}
+    drawn = set()
+    for slot, label in sorted(trait_values.items()):
+        hit = resolve_feature(label)
+        if hit is None or hit[0] in drawn:
+            chips[slot] = label
+        else:
+            drawn.add(hit[0])
+            features[hit[0]] = hit[1]
+    return features, chips
+
+
+def layer_fragments(trait_values: dict, caption: str) -> list[tuple[tuple, str]]:
+    """
+    The cat as an ordered (bottom → top) list of (layer key, SVG fragment).
+    The key names everything the fragment depends on, so compose_layers.py can
+    rasterize each distinct fragment once and reuse it.
+    """
+
+    features, chips = resolve_features(trait_values)
+    body_color = features["body"]
+    eye_color = features["eyes"]
+    tail_name = features["tail"]
+    ear_name = features["ears"]
+    pattern_type = features["pattern"]
+
+    layers = [
+        (("background",), '<rect width="100%" height="100%" fill="#222"/>'),
+        (
+            ("caption", caption),
+            f'<text x="{CANVAS_W/2}" y="50" font-size="28" text-anchor="middle" fill="white">{caption}</text>',
+        ),
+        # Body + head
+        (
+            ("body", body_color),
+            f'''<ellipse cx="400" cy="300" rx="120" ry="70" fill="{body_color}"/>
+      <circle cx="400" cy="200" r="50" fill="{body_color}"/>''',
+        ),
+        (
+            ("eyes", eye_color),
+            f'''<circle cx="380" cy="190" r="8" fill="{eye_color}"/>
+      <circle cx="420" cy="190" r="8" fill="{eye_color}"/>''',
+        ),
+        (("ears", ear_name, body_color), EARS[ear_name].format(color=body_color).strip()),
+        (("tail", tail_name, body_color), TAILS[tail_name].format(color=body_color)),
+        (("pattern", pattern_type), PATTERNS[pattern_type]),
+        (("ground",), '<rect y="400" width="100%" height="80" fill="#333"/>'),
+    ]
+    # One chip per slot on the ground strip, for traits not drawn above
+    for i, slot in enumerate(sorted(trait_values)):
+        label = chips.get(slot)
+        x = CANVAS_W * (2 * i + 1) / (2 * len(trait_values))
+        fragment = (
+            f'<text x="{x:.0f}" y="445" font-size="16" text-anchor="middle" fill="#ddd">{label}</text>' if label else ""
+        )
+        layers.append((("chip", slot, label), fragment))
+    return layers
+
 
 def compose_svg(trait_values: dict, caption: str) -> str:
     """Return a full SVG string for the cat based on resolved traits."""
 
-    body_color = COLORS["body"].get(trait_values.get("A"), "#aaaaaa")
-    eye_color = COLORS["eyes"].get(trait_values.get("B"), "#66ccff")
-    tail_shape = TAILS.get(trait_values.get("C"), TAILS["Short Tail"])
-    ear_shape = EARS.get(trait_values.get("D"), EARS["Pointy Ears"])
-    pattern_type = COLORS["pattern"].get(trait_values.get("E"), "solid")
-
-    # Simple pattern overlay (optional spots)
-    pattern_layer = ""
-    if pattern_type == "spots":
-        pattern_layer = "".join(
-            f"<circle cx='{x}' cy='{y}' r='8' fill='rgba(0,0,0,0.2)'/>"
-            for x, y in [(370, 310), (420, 320), (390, 340), (410, 285)]
-        )
-
+    layers = "\n      ".join(fragment for _key, fragment in layer_fragments(trait_values, caption) if fragment)
     svg = f"""<svg xmlns="http://www.w3.org/2000/svg" width="{CANVAS_W}" height="{CANVAS_H}">
-      <rect width="100%" height="100%" fill="#222"/>
-      <text x="{CANVAS_W/2}" y="50" font-size="28" text-anchor="middle" fill="white">{caption}</text>
-
-      <!-- Body -->
-      <ellipse cx="400" cy="300" rx="120" ry="70" fill="{body_color}"/>
+      {layers}
+    </svg>"""
 
-      <!-- Head -->
-      <circle cx="400" cy="200" r="50" fill="{body_color}"/>
-      <circle cx="380" cy="190" r="8" fill="{eye_color}"/>
-      <circle cx="420" cy="190" r="8" fill="{eye_color}"/>
+    return svg
 
-      <!-- Ears -->
-      {ear_shape.format(color=body_color)}
 
-      <!-- Tail -->
-      {tail_shape.format(color=body_color)}
+def check_rounds() -> list[str]:
+    """
+    Every round × genotype × single tile flip must change at least one layer key,
+    or the layer renderer would draw the same cat for both. Returns the failures.
+    """
+    from config import ROUNDS
+    from genotype import BIT, FULL, phenotype_labels
 
-      <!-- Pattern -->
-      {pattern_layer}
+    failures = []
+    for round_cfg in ROUNDS:
+        for mask in range(FULL + 1):
+            keys = [key for key, _ in layer_fragments(phenotype_labels(round_cfg, mask), "")]
+            for slot, bit in BIT.items():
+                if mask & bit:
+                    continue  # each pair once
+                flipped = phenotype_labels(round_cfg, mask | bit)
+                if keys == [key for key, _ in layer_fragments(flipped, "")]:
+                    failures.append(f"round {round_cfg['id']} mask {mask:05b}: slot {slot} changes no layer")
+    return failures
 
-      <!-- Ground -->
-      <rect y="400" width="100%" height="80" fill="#333"/>
-    </svg>"""
 
-    return svg
+if __name__ == "__main__":
+    import sys
 
+    if "--check" in sys.argv:
+        problems = check_rounds()
+        print("\n".join(problems) or "✅ every tile flip changes the layers")
+        sys.exit(1 if problems else 0)
 
-if __name__ == "__main__":
     # Example standalone test
     traits = {
-        "A": "Striped",
-        "B": "Green Eyes",
-        "C": "Long Tail",
-        "D": "Pointy Ears",
-        "E": "Spotted",
+        "A": "green eyes",
+        "B": "long fur",
+        "C": "pointy ears",
+        "D": "long tail",
+        "E": "orange coat",
     }
     svg_str = compose_svg(traits, "Test Cat — Manual Compose")
     Path("output/test_cat.svg").write_text(svg_str)
@@ -140,6 +140,27 @@ HALL_PINS = {
     "E": {"dom": 4, "rec": 7},
 }
 
+# Software debounce for edge-triggered Hall reads (GeneBoard.start_edge_detection)
+HALL_DEBOUNCE_MS = 30
+
+# Stable board reads (GeneBoard.read_with_retries): Hall reads per majority vote,
+# and how many extra vote rounds a slot may spend on 'invalid' / split results
+BOARD_VOTE_READS = 5
+BOARD_MAX_RETRIES = 3
+
+# Background sampler (GeneBoard.start_sampler): reads per second, ring buffer length
+SAMPLER_RATE_HZ = 20
+SAMPLER_CAPACITY = 256
+# Sample on debounced Hall edges instead of at SAMPLER_RATE_HZ (falls back to polling
+# where edges can't be watched), with one read every SAMPLER_IDLE_SECONDS regardless
+SAMPLER_EDGE = True
+SAMPLER_IDLE_SECONDS = 1.0
+
+# Simulated hardware (hardware.SimBackend, used by --test): ADC noise (std dev in raw
+# codes) and time per MCP3008 SPI transfer
+SIM_ADC_NOISE_CODES = 2.0
+SIM_SPI_LATENCY_US = 40
+
 # LEDs (BCM) per slot
 LED_PINS = {
     "A": {"green": 12, "red": 16},
@@ -152,6 +173,18 @@ LED_PINS = {
 # MCP3008 analog channels for pogo ID
 ADC_CHANNEL = {"A": 0, "B": 1, "C": 2, "D": 3, "E": 4}
 
+# ADC oversampling (GeneBoard.read_all_raw): at most ADC_OVERSAMPLE conversions per
+# channel, stopping after ADC_SETTLE_SAMPLES once they agree within ADC_AGREE_CODES,
+# and how to reduce them to one raw code — "median" or "trimmed" (mean of the middle
+# samples). Each conversion is one SPI transfer, so these set snapshot() time. Quiet
+# channels stop at ADC_SETTLE_SAMPLES; noisy ones get more samples than a plain
+# mean of 5 so the integer code is no noisier than it was.
+ADC_OVERSAMPLE = 7
+ADC_SETTLE_SAMPLES = 4
+ADC_AGREE_CODES = 2
+ADC_FILTER = "trimmed"
+ADC_TRIM_FRACTION = 0.15  # dropped from each end for "trimmed": 1 of 7, none of 4–6
+
 # Expected tile IDs (labels are arbitrary strings you define)
 TILE_ID_BY_SLOT = {
     "A": {"dom": "A_DOM", "rec": "A_REC"},
@@ -161,7 +194,7 @@ TILE_ID_BY_SLOT = {
     "E": {"dom": "E_DOM", "rec": "E_REC"},
 }
 
-# TEMP thresholds — calibrate and update!
+# TEMP thresholds — calibrate and update! (or run calibration.py to write ADC_LUT_PATH)
 ADC_ID_THRESHOLDS = {
     "A": [(0.40, "A_DOM"), (0.85, "A_REC")],
     "B": [(0.45, "B_DOM"), (0.90, "B_REC")],
@@ -170,5 +203,107 @@ ADC_ID_THRESHOLDS = {
     "E": [(0.60, "E_DOM"), (1.05, "E_REC")],
 }
 
+# Compiled raw-code → tile lookup tables written by calibration.py (falls back to
+# the thresholds above when missing); codes this close to a boundary read "uncertain"
+ADC_LUT_PATH = "adc_lut.json"
+ADC_HYSTERESIS_CODES = 6  # ≈ 20 mV
+
 # 7-segment via MAX7219 (optional)
 USE_MAX7219 = True  # flip to True when you add the module
+SEVENSEG_DIGITS = 3  # percent, right-aligned
+SEVENSEG_INTENSITY = 8  # 0..15
+
+# LED / 7-seg updates closer together than this are coalesced (outputs.OutputDriver)
+OUTPUT_MAX_RATE_HZ = 10
+
+
+# --------------------------
+# Display & render cache
+# --------------------------
+
+# 3.5" screen resolution (see README)
+DISPLAY_WIDTH = 480
+DISPLAY_HEIGHT = 320
+
+# What display_cat.py shows (written by generate_cat.py) and how often it re-checks
+# the file when inotify isn't available
+PNG_PATH = "output/cat.png"
+DISPLAY_POLL_SECONDS = 1.0
+
+# Pre-scaled RGB565 frame published next to the PNG; display_cat.py copies it
+# straight into this framebuffer (when it is 16 bpp at the size above)
+FRAME_PATH = "output/cat.rgb565"
+FRAMEBUFFER_DEVICE = "/dev/fb1"
+# Written last on every publish (state_store.Manifest): displays wait for a new
+# generation here instead of watching the image files themselves; each generation
+# also carries the changed rectangle, so displays can refresh just that part
+MANIFEST_PATH = "output/manifest.json"
+
+# display_cat.py --gallery: seconds per cat, how many recent cats to cycle through,
+# and the memory budget for decoded (display-format) images kept between rounds
+GALLERY_SECONDS = 8.0
+GALLERY_SIZE = 30
+GALLERY_CACHE_BYTES = 8 * 1024 * 1024
+
+# Rendered cats are cached on disk, keyed by round + genotype + caption. An entry is
+# ≈ 320 KB, nearly all of it the 300 KB RGB565 frame, so a full --prerender (every
+# round × 32 genotypes) is ≈ 80 MB per render backend; the budget holds both.
+RENDER_CACHE_DIR = "output/cache"
+RENDER_CACHE_MAX_BYTES = 192 * 1024 * 1024
+
+# Fallback (non-AI) renderer: "svg" rasterizes a full SVG with cairosvg each time;
+# "layers" composites cached per-trait raster layers (compose_layers.py, needs numpy)
+RENDER_BACKEND = "svg"
+
+# AI images (enabled by OPENAI_API_KEY): the SVG fallback is shown right away and the
+# AI image swaps in when it arrives, if it does so within the deadline
+AI_MODEL = "gpt-image-1"
+AI_SIZE = "1024x1024"
+AI_DEADLINE_SECONDS = 60
+AI_MAX_CONCURRENCY = 2
+
+# Generated AI images are kept on disk, keyed by the exact prompt, so each phenotype
+# is only paid for once; in --daemon, idle time prefetches cats one tile flip away
+AI_CACHE_DIR = "output/ai_cache"
+AI_CACHE_MAX_BYTES = 256 * 1024 * 1024
+AI_PREFETCH_IDLE_SECONDS = 10  # board quiet this long before prefetching
+AI_PREFETCH_MIN_INTERVAL = 60  # seconds between prefetch requests
+AI_PREFETCH_DAILY_BUDGET = 20  # prefetch requests per calendar day
+
+# Every published cat is appended here (history.py), with archived display PNGs
+HISTORY_DIR = "output/history"
+
+# Control socket for `generate_cat.py --daemon` (nightly trigger: `--trigger`)
+DAEMON_SOCKET = "output/kitty.sock"
+
+# bench.py: where results go, the stored baseline they are compared against, and how
+# much slower (p50) or bigger (peak memory) than the baseline counts as a regression
+BENCH_RESULTS_PATH = "output/bench.json"
+BENCH_BASELINE_PATH = "bench_baseline.json"
+BENCH_TOLERANCE = 0.25
+
+# Per-stage timings and counters (metrics.py): exported to this Prometheus textfile and
+# embedded in cat_of_the_day.json; latency quantiles cover the last METRICS_RING_SIZE
+# runs of each stage. KITTY_METRICS=0 in the environment also turns them off.
+METRICS_ENABLED = True
+METRICS_RING_SIZE = 128
+METRICS_TEXTFILE = "output/kitty.prom"
+
+
+# --------------------------
+# Stations (stations.py)
+# --------------------------
+
+# Several gene boards served by one process. Per station: name, output directory (game
+# state, cat, manifest, history) and, where it differs from the single-board settings
+# above, spi_bus / spi_device (MCP3008 chip select), hall_pins, led_pins, adc_channel,
+# lut_path (tile calibration) and sevenseg ([bus, device] of its MAX7219, if any).
+# The main board keeps the 7-segment generate_cat.py drives (USE_MAX7219, SPI0 CE1).
+STATIONS = [
+    {"name": "main", "out_dir": "output", "sevenseg": [0, 1] if USE_MAX7219 else None},
+    # {"name": "porch", "out_dir": "output/stations/porch", "spi_bus": 1, "spi_device": 0,
+    #  "hall_pins": {...}, "led_pins": {...}, "lut_path": "adc_lut.porch.json"},
+]
+# Render processes shared by all stations (each distinct round × genotype renders once)
+STATION_RENDER_WORKERS = 2
+STATIONS_SOCKET = "output/stations.sock"
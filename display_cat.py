@@ -1,7 +1,11 @@
 # 📁 FILE: display_cat.py
-# Show the most recent cat PNG on a 480x320 display. Auto-reloads if file changes.
-import os, time
-import os
+# Show the most recent cat on a 480x320 display. Redraws only when generate_cat.py
+# publishes a new manifest generation (state_store.Manifest).
+# With --gallery, cycle through recent cats from the history instead.
+import os, time, select, struct, threading, argparse
+import ctypes, ctypes.util
+from collections import OrderedDict
+from pathlib import Path
 
 # Use framebuffer if it exists, otherwise dummy (for HDMI/headless testing)
 if os.path.exists("/dev/fb1"):
@@ -11,48 +15,356 @@ else:
     os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
 
 import pygame
-from config import DISPLAY_WIDTH, DISPLAY_HEIGHT, PNG_PATH
+from config import DISPLAY_WIDTH, DISPLAY_HEIGHT, PNG_PATH, DISPLAY_POLL_SECONDS, FRAME_PATH, MANIFEST_PATH
+from config import GALLERY_SECONDS, GALLERY_SIZE, GALLERY_CACHE_BYTES
+from framebuffer import Framebuffer, partial_box
+from state_store import ManifestReader
 
 os.environ.setdefault("SDL_FBDEV", "/dev/fb1" if os.path.exists("/dev/fb1") else "/dev/fb0")
 os.environ.setdefault("SDL_VIDEODRIVER", "fbcon")
 
+# inotify (linux/inotify.h)
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+_EVENT = struct.Struct("iIII")
+
+
+class FileWatcher:
+    """
+    Block until a file changes. Uses inotify on the file's directory (so atomic
+    renames and not-yet-existing files are seen), or mtime polling if unavailable.
+    """
+
+    def __init__(self, path: str, poll_interval: float = DISPLAY_POLL_SECONDS):
+        self.path = os.path.abspath(path)
+        self.name = os.path.basename(self.path).encode()
+        self.poll_interval = poll_interval
+        self.fd = None
+        self._last = self._stamp()
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+            fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            directory = os.path.dirname(self.path)
+            os.makedirs(directory, exist_ok=True)
+            mask = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+            if fd >= 0 and libc.inotify_add_watch(fd, directory.encode(), mask) >= 0:
+                self.fd = fd
+            elif fd >= 0:
+                os.close(fd)
+        except (OSError, AttributeError):
+            self.fd = None
+
+    def _stamp(self):
+        try:
+            st = os.stat(self.path)
+            return (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            return None
+
+    def wait(self, timeout: float) -> bool:
+        """True if the file changed within `timeout` seconds."""
+        if self.fd is None:
+            deadline = time.monotonic() + timeout
+            while True:
+                stamp = self._stamp()
+                if stamp != self._last:
+                    self._last = stamp
+                    return True
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    return False
+                time.sleep(min(self.poll_interval, left))
+        deadline = time.monotonic() + timeout
+        while True:
+            left = deadline - time.monotonic()
+            if left <= 0 or not select.select([self.fd], [], [], left)[0]:
+                return False
+            if self._read_events():
+                self._last = self._stamp()
+                return True
+
+    def _read_events(self) -> bool:
+        # Drain queued inotify events; True if any of them concern our file
+        data = os.read(self.fd, 4096)
+        changed = False
+        off = 0
+        while off < len(data):
+            _wd, _mask, _cookie, length = _EVENT.unpack_from(data, off)
+            name = data[off + _EVENT.size : off + _EVENT.size + length].rstrip(b"\0")
+            changed |= name == self.name
+            off += _EVENT.size + length
+        return changed
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+def manifest_artifact(doc: dict | None, names: tuple[str, ...], default: str) -> str:
+    """Path of the first of `names` the manifest lists; `default` before any manifest exists."""
+    artifacts = (doc or {}).get("artifacts", {})
+    for name in names:
+        if name in artifacts:
+            return artifacts[name]["path"]
+    return default
+
+
+def manifest_dirty(doc: dict | None) -> dict:
+    """The generation's dirty record ({} before any manifest exists: full redraw)."""
+    return (doc or {}).get("dirty") or {}
+
+
+def load_scaled(path: str | Path) -> pygame.Surface:
+    """Decode + scale to the display size; safe off the main thread (convert() is not)."""
+    img = pygame.image.load(str(path))
+    if img.get_size() != (DISPLAY_WIDTH, DISPLAY_HEIGHT):
+        img = pygame.transform.smoothscale(img, (DISPLAY_WIDTH, DISPLAY_HEIGHT))
+    return img
+
+
+class SurfaceCache:
+    """LRU of decoded, display-format surfaces, bounded by their pixel memory."""
+
+    def __init__(self, budget: int = GALLERY_CACHE_BYTES):
+        self.budget = budget
+        self.used = 0
+        self._items = OrderedDict()  # path → surface
+
+    def get(self, path) -> pygame.Surface | None:
+        surf = self._items.get(path)
+        if surf is not None:
+            self._items.move_to_end(path)
+        return surf
+
+    def put(self, path, surf: pygame.Surface):
+        old = self._items.pop(path, None)
+        if old is not None:
+            self.used -= _surface_bytes(old)
+        self._items[path] = surf
+        self.used += _surface_bytes(surf)
+        while self.used > self.budget and len(self._items) > 1:
+            _, dropped = self._items.popitem(last=False)
+            self.used -= _surface_bytes(dropped)
+
+
+def _surface_bytes(surf: pygame.Surface) -> int:
+    return surf.get_pitch() * surf.get_height()
+
+
+class Preloader:
+    """
+    Decodes the image the gallery shows next on a background thread. The main thread
+    calls collect() to convert finished images to the display format and cache them.
+    """
+
+    def __init__(self, cache: SurfaceCache):
+        self.cache = cache
+        self.failed = set()  # paths that could not be decoded
+        self._want = None
+        self._done = []
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="gallery-preload", daemon=True)
+        self._thread.start()
+
+    def request(self, path):
+        if self.cache.get(path) is None:
+            with self._cond:
+                self._want = path
+                self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._want is None:
+                    self._cond.wait()
+                path, self._want = self._want, None
+            try:
+                img = load_scaled(path)
+            except (pygame.error, OSError):
+                img = None  # archived file gone or unreadable; the gallery skips it
+            with self._cond:
+                self._done.append((path, img))
+
+    def collect(self):
+        with self._cond:
+            done, self._done = self._done, []
+        for path, img in done:
+            if img is None:
+                self.failed.add(path)
+            else:
+                self.cache.put(path, img.convert())
+
 
 class CatDisplay:
     def __init__(self):
         pygame.init()
         self.screen = pygame.display.set_mode((DISPLAY_WIDTH, DISPLAY_HEIGHT))
         pygame.mouse.set_visible(False)
-        self.clock = pygame.time.Clock()
-        self.last_mtime = 0
+        self.watcher = FileWatcher(MANIFEST_PATH)
+        self.manifest = ManifestReader(MANIFEST_PATH)
         self.image = None
+        self._placeholder = None
+        self.shown_id = None  # dirty record id of the frame on screen (see framebuffer.dirty_record)
 
-    def load_image(self):
-        if not os.path.exists(PNG_PATH):
-            # placeholder screen
-            self.screen.fill((245, 239, 230))
+    def placeholder(self) -> pygame.Surface:
+        # Rendered once; SysFont lookup + text render is slow on the Pi
+        if self._placeholder is None:
+            surf = pygame.Surface((DISPLAY_WIDTH, DISPLAY_HEIGHT)).convert()
+            surf.fill((245, 239, 230))
             font = pygame.font.SysFont("Verdana", 24)
             txt = font.render("No cat yet — run generate_cat.py", True, (40, 40, 40))
-            self.screen.blit(txt, (20, DISPLAY_HEIGHT // 2 - 12))
-            pygame.display.flip()
+            surf.blit(txt, (20, DISPLAY_HEIGHT // 2 - 12))
+            self._placeholder = surf
+        return self._placeholder
+
+    def load_image(self, path: str = PNG_PATH) -> bool:
+        if not os.path.exists(path):
+            self.image = None
+            return True
+        try:
+            img = load_scaled(path)
+        except pygame.error:
+            return False  # unreadable; the next generation will bring us back
+        self.image = img.convert()  # display pixel format → cheap blits
+        return True
+
+    def draw(self, box: tuple | None = None):
+        if box and self.image:
+            # Only the generator's dirty rectangle changed (e.g. one tile swap)
+            x0, y0, x1, y1 = box
+            rect = pygame.Rect(x0, y0, x1 - x0, y1 - y0)
+            self.screen.blit(self.image, rect.topleft, rect)
+            pygame.display.update(rect)
+            return
+        self.screen.blit(self.image or self.placeholder(), (0, 0))
+        pygame.display.flip()
+
+    def refresh(self):
+        doc = self.manifest.poll()
+        if doc is None and self.manifest.generation:
+            return  # no new generation: nothing to re-read or redraw
+        # The manifest is written after every file of its generation is in place; prefer
+        # the pre-scaled PNG (no smoothscale) and fall back to the full-size one
+        if not self.load_image(manifest_artifact(doc, ("display_png", "png"), PNG_PATH)):
             return
-        mtime = os.path.getmtime(PNG_PATH)
-        if mtime != self.last_mtime:
-            self.last_mtime = mtime
-            img = pygame.image.load(PNG_PATH)
-            self.image = pygame.transform.smoothscale(img, (DISPLAY_WIDTH, DISPLAY_HEIGHT))
+        # Partial refresh only if this generation was diffed against the frame on screen
+        dirty = manifest_dirty(doc)
+        self.draw(partial_box(dirty, self.shown_id))
+        self.shown_id = dirty.get("id") if self.image else None
 
     def loop(self):
+        self.refresh()
+        while True:
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    self.watcher.close()
+                    return
+            # Sleep in the kernel until the manifest changes (or wake briefly to pump events)
+            if self.watcher.wait(timeout=1.0):
+                self.refresh()
+
+    # ----- Gallery -----
+    def gallery_paths(self, count: int = GALLERY_SIZE) -> list[Path]:
+        """Archived display PNGs of the last `count` cats, newest first, without repeats."""
+        from history import History
+
+        h = History()
+        paths = []
+        for rec in h.last(count):
+            path = h.root / rec["png"] if rec.get("png") else None
+            if path and path not in paths and path.exists():
+                paths.append(path)
+        return paths
+
+    def gallery(self, seconds: float = GALLERY_SECONDS, count: int = GALLERY_SIZE):
+        """
+        Slideshow of recent cats. The next image is decoded in the background while the
+        current one is up, and decoded images stay in a SurfaceCache, so a transition is
+        just a blit. Slides keep to a fixed schedule; the history is re-read each lap.
+        """
+        paths = self.gallery_paths(count)
+        if not paths:
+            return self.loop()
+        cache = SurfaceCache()
+        preload = Preloader(cache)
+        preload.request(paths[0])
+        i = 0
+        due = time.monotonic()
+        clock = pygame.time.Clock()
         while True:
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
+                    self.watcher.close()
                     return
-            self.load_image()
-            if self.image:
-                self.screen.blit(self.image, (0, 0))
+            preload.collect()
+            now = time.monotonic()
+            surf = cache.get(paths[i]) if now >= due else None
+            if surf is not None:
+                self.screen.blit(surf, (0, 0))
                 pygame.display.flip()
-            self.clock.tick(10)
+                i += 1
+                if i == len(paths):
+                    i = 0
+                    paths = self.gallery_paths(count) or paths
+                preload.request(paths[i])
+                # Fixed schedule; if a decode ran late, restart it rather than rush the next slides
+                due = due + seconds if due + seconds > now else now + seconds
+            elif paths[i] in preload.failed:
+                paths.pop(i)
+                if not paths:
+                    return self.loop()
+                i %= len(paths)
+                preload.request(paths[i])
+            clock.tick(20)  # ~50 ms ticks: responsive to events, idle otherwise
+
+
+class FramebufferDisplay:
+    """Copies generate_cat.py's pre-scaled RGB565 frame into the mmap'd framebuffer: no decode, no scale."""
+
+    def __init__(self, fb: Framebuffer):
+        self.fb = fb
+        self.watcher = FileWatcher(MANIFEST_PATH)
+        self.manifest = ManifestReader(MANIFEST_PATH)
+        self.shown_id = None
+
+    def refresh(self):
+        doc = self.manifest.poll()
+        if doc is None and self.manifest.generation:
+            return
+        frame = manifest_artifact(doc, ("frame",), FRAME_PATH)
+        if not os.path.exists(frame):
+            return
+        dirty = manifest_dirty(doc)
+        if self.fb.show(frame, partial_box(dirty, self.shown_id)):
+            self.shown_id = dirty.get("id")
+
+    def loop(self):
+        try:
+            self.refresh()
+            while True:
+                if self.watcher.wait(timeout=60.0):
+                    self.refresh()
+        finally:
+            self.watcher.close()
+            self.fb.close()
 
 
 if __name__ == "__main__":
-    app = CatDisplay()
-    app.loop()
+    ap = argparse.ArgumentParser(description="Show the latest cat (or a gallery of recent ones)")
+    ap.add_argument("--gallery", action="store_true", help="Cycle through recent cats from the history")
+    ap.add_argument("--seconds", type=float, default=GALLERY_SECONDS, help="Seconds per cat in --gallery")
+    ap.add_argument("--count", type=int, default=GALLERY_SIZE, help="How many recent cats --gallery cycles")
+    args = ap.parse_args()
+    if args.gallery:
+        CatDisplay().gallery(args.seconds, args.count)
+    else:
+        # Raw frames need a 16 bpp panel of the right size; otherwise (or before the first
+        # frame exists, e.g. no Pillow on the generator) fall back to pygame.
+        fb = Framebuffer.open() if os.path.exists(FRAME_PATH) else None
+        app = FramebufferDisplay(fb) if fb else CatDisplay()
+        app.loop()
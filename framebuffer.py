@@ -0,0 +1,125 @@
+# framebuffer.py
+# Pre-scaled raw frames in the panel's native pixel format (RGB565), and a
+# memory-mapped /dev/fbN backend that shows one with a single copy — no PNG decode.
+import mmap, os, sys, time
+from array import array
+from pathlib import Path
+
+from config import DISPLAY_WIDTH, DISPLAY_HEIGHT, FRAMEBUFFER_DEVICE
+
+
+def png_to_rgb565(src: str | Path, width: int = DISPLAY_WIDTH, height: int = DISPLAY_HEIGHT) -> bytes:
+    """Decode + scale a PNG to little-endian RGB565 (needs Pillow; NumPy makes it fast)."""
+    from PIL import Image
+
+    with Image.open(src) as im:
+        im = im.convert("RGB")
+        if im.size != (width, height):
+            im = im.resize((width, height))
+        try:
+            import numpy as np
+
+            a = np.asarray(im, dtype=np.uint16)
+            px = ((a[..., 0] >> 3) << 11) | ((a[..., 1] >> 2) << 5) | (a[..., 2] >> 3)
+            return px.astype("<u2").tobytes()
+        except ImportError:
+            rgb = im.tobytes()
+    out = array("H", bytes(2 * width * height))
+    for i in range(width * height):
+        r, g, b = rgb[3 * i], rgb[3 * i + 1], rgb[3 * i + 2]
+        out[i] = ((r >> 3) << 11) | ((g >> 2) << 5) | (b >> 3)
+    if sys.byteorder == "big":
+        out.byteswap()
+    return out.tobytes()
+
+
+def rgb_to_rgb565(rgb) -> bytes:
+    """H × W × 3 uint8 NumPy array (e.g. from compose_layers) → little-endian RGB565."""
+    a = rgb.astype("uint16")
+    px = ((a[..., 0] >> 3) << 11) | ((a[..., 1] >> 2) << 5) | (a[..., 2] >> 3)
+    return px.astype("<u2").tobytes()
+
+
+def write_frame_bytes(data: bytes, dest: str | Path):
+    dest = Path(dest)
+    tmp = dest.with_name(dest.name + ".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, dest)
+
+
+def write_frame(src_png: str | Path, dest: str | Path) -> bool:
+    """Publish the raw frame for src_png atomically; drops any stale frame on failure."""
+    dest = Path(dest)
+    try:
+        data = png_to_rgb565(src_png)
+    except Exception:
+        dest.unlink(missing_ok=True)
+        return False
+    write_frame_bytes(data, dest)
+    return True
+
+
+# ---------- Dirty rectangles ----------
+# Every manifest generation carries {"id", "base", "box"} under "dirty": the frame the
+# generator diffed against and the changed box (x0, y0, x1, y1) in display pixels, or
+# None for "redraw everything". Displays only do a partial update when `base` is the
+# frame they are showing, so a skipped generation just costs a full redraw.
+def dirty_record(base: str | None, box: tuple | None) -> dict:
+    return {"id": f"{os.getpid()}-{time.time_ns()}", "base": base, "box": list(box) if box else None}
+
+
+def partial_box(dirty: dict, shown_id: str | None) -> tuple | None:
+    """The box to refresh if `dirty` applies on top of the frame being shown, else None (full redraw)."""
+    if shown_id is not None and dirty.get("base") == shown_id and dirty.get("box"):
+        return tuple(dirty["box"])
+    return None
+
+
+def _sysfs(dev: str, attr: str) -> str:
+    return Path(f"/sys/class/graphics/{os.path.basename(dev)}/{attr}").read_text().strip()
+
+
+class Framebuffer:
+    """mmap of a 16 bpp framebuffer sized DISPLAY_WIDTH × DISPLAY_HEIGHT (e.g. the SPI TFT on fb1)."""
+
+    def __init__(self, dev: str = FRAMEBUFFER_DEVICE):
+        self.dev = dev
+        self.width, self.height = (int(v) for v in _sysfs(dev, "virtual_size").split(","))
+        self.bpp = int(_sysfs(dev, "bits_per_pixel"))
+        self.stride = int(_sysfs(dev, "stride"))
+        if self.bpp != 16 or (self.width, self.height) != (DISPLAY_WIDTH, DISPLAY_HEIGHT):
+            raise OSError(f"{dev}: {self.width}x{self.height}@{self.bpp}bpp, want {DISPLAY_WIDTH}x{DISPLAY_HEIGHT}@16")
+        self._fd = os.open(dev, os.O_RDWR)
+        self.mem = mmap.mmap(self._fd, self.stride * self.height)
+        self.view = memoryview(self.mem)
+
+    @classmethod
+    def open(cls, dev: str = FRAMEBUFFER_DEVICE) -> "Framebuffer | None":
+        """None when the device is missing or not a format we can blit RGB565 frames into."""
+        try:
+            return cls(dev)
+        except (OSError, ValueError):
+            return None
+
+    def show(self, frame_path: str | Path, box: tuple | None = None) -> bool:
+        """Copy a frame in; with box=(x0, y0, x1, y1) only that rectangle is copied."""
+        row = self.width * 2
+        with open(frame_path, "rb") as f:
+            if os.fstat(f.fileno()).st_size != row * self.height:
+                return False
+            if box is not None:
+                x0, y0, x1, y1 = box
+                for y in range(y0, y1):
+                    f.seek(y * row + x0 * 2)
+                    f.readinto(self.view[y * self.stride + x0 * 2 : y * self.stride + x1 * 2])
+            elif self.stride == row:
+                f.readinto(self.view[: row * self.height])  # kernel copies straight into the fb
+            else:
+                for y in range(self.height):
+                    f.readinto(self.view[y * self.stride : y * self.stride + row])
+        return True
+
+    def close(self):
+        self.view.release()
+        self.mem.close()
+        os.close(self._fd)
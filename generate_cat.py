@@ -1,40 +1,149 @@
 #!/usr/bin/env python3
-import os, json, argparse, base64, random
+import time
+
+_T_START = time.perf_counter()
+import os, json, argparse, random, tempfile
+import queue, signal, socket, socketserver, threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
 from datetime import datetime, date
 from pathlib import Path
-import cairosvg
-
-from config import ROUNDS, ROUND_START_OFFSET, TILE_ID_BY_SLOT, USE_MAX7219
-from sensors import GeneBoard
 
-# Optional AI image generation (set OPENAI_API_KEY env var to enable)
-_USE_AI = bool(os.getenv("OPENAI_API_KEY"))
-if _USE_AI:
+from config import ROUNDS, ROUND_START_OFFSET, USE_MAX7219, DISPLAY_WIDTH, DISPLAY_HEIGHT
+from config import DAEMON_SOCKET, RENDER_BACKEND, AI_MODEL, AI_SIZE, AI_CACHE_DIR, AI_CACHE_MAX_BYTES
+from config import AI_PREFETCH_IDLE_SECONDS
+from render_cache import RenderCache, cache_key, ai_cache_key
+from genotype import BIT, FULL, POPCOUNT, genotype_mask, genotype_dict, genotype_code, pack_board, match_masks
+from genotype import phenotype_labels
+from framebuffer import write_frame, write_frame_bytes, rgb_to_rgb565, dirty_record
+from state_store import StateStore, Manifest, atomic_write, staged_paths, publish_files
+from metrics import METRICS
+
+# ---------- Lazy subsystems ----------
+# Heavy backends (AI client, 7-seg, rasterizer, GPIO/SPI) are only imported and
+# initialized on first use; --profile-startup prints what each one cost.
+STARTUP_TIMES = {"module imports": time.perf_counter() - _T_START}
+
+
+@contextmanager
+def startup_span(name: str):
+    t0 = time.perf_counter()
     try:
-        from openai import OpenAI
+        yield
+    finally:
+        STARTUP_TIMES[name] = STARTUP_TIMES.get(name, 0.0) + time.perf_counter() - t0
 
-        _openai = OpenAI()
-    except Exception:
-        _USE_AI = False
 
-# Optional MAX7219 7-seg percent
-_segdev = None
-if USE_MAX7219:
-    try:
-        from luma.core.interface.serial import spi as lspi
-        from luma.led_matrix.device import max7219
+class Lazy:
+    """Build a backend on first get(); optional backends yield None instead of raising."""
+
+    def __init__(self, name: str, factory, optional: bool = True):
+        self.name = name
+        self.factory = factory
+        self.optional = optional
+        self._lock = threading.Lock()
+        self._done = False
+        self._value = None
+
+    @property
+    def ready(self) -> bool:
+        """Already built (so get() is free)?"""
+        return self._done
+
+    def get(self):
+        if not self._done:
+            with self._lock:
+                if not self._done:
+                    with startup_span(self.name):
+                        try:
+                            self._value = self.factory()
+                        except Exception as e:
+                            if not self.optional:
+                                raise
+                            print(f"{self.name} unavailable: {e}")
+                            self._value = None
+                    self._done = True
+        return self._value
+
+
+def ai_enabled() -> bool:
+    # Optional AI image generation (set OPENAI_API_KEY env var to enable)
+    return bool(os.getenv("OPENAI_API_KEY"))
+
+
+def _make_ai_pipeline():
+    from ai_pipeline import AIPipeline
+
+    return AIPipeline()
+
+
+def _make_sevenseg():
+    # Optional MAX7219 7-seg percent
+    if not USE_MAX7219:
+        return None
+    import spidev
+    from outputs import SevenSegment
+
+    spi = spidev.SpiDev()
+    spi.open(0, 1)  # CE1
+    spi.max_speed_hz = 1_000_000
+    return SevenSegment(spi.xfer2)
+
+
+def _make_history():
+    from history import History
+
+    return History()
+
+
+def _make_rasterizer():
+    import cairosvg
+
+    return cairosvg.svg2png
+
+
+ai_pipeline = Lazy("ai pipeline", _make_ai_pipeline, optional=False)
+sevenseg_device = Lazy("max7219", _make_sevenseg)
+
+
+def _make_compositors():
+    from compose_svg import CANVAS_W, CANVAS_H
+    from compose_layers import LayerCompositor
+
+    # One per output size; each caches its own rasterized layers (warm in --daemon)
+    return {"png": LayerCompositor(CANVAS_W, CANVAS_H), "display_png": LayerCompositor(DISPLAY_WIDTH, DISPLAY_HEIGHT)}
+
+
+rasterizer = Lazy("cairosvg", _make_rasterizer, optional=False)
+compositors = Lazy("layer compositor", _make_compositors, optional=False)
+history = Lazy("history", _make_history, optional=False)
+
+
+def open_board(backend=None):
+    """GeneBoard on the real GPIO/SPI, or on `backend` (e.g. a hardware.SimBackend)."""
+    with startup_span("sensors import"):
+        from sensors import GeneBoard
+    with startup_span("GeneBoard init"):
+        return GeneBoard(backend)
+
+
+def print_startup_profile():
+    total = time.perf_counter() - _T_START
+    print("⏱  Startup profile (import + init per subsystem)")
+    for name, secs in sorted(STARTUP_TIMES.items(), key=lambda kv: -kv[1]):
+        print(f"  {name:<20} {secs * 1000:8.1f} ms")
+    print(f"  {'(process total)':<20} {total * 1000:8.1f} ms")
 
-        serial = lspi(port=0, device=1)  # CE1
-        _segdev = max7219(serial, cascaded=1, block_orientation=0, rotate=0)
-    except Exception:
-        _segdev = None
 
 OUT = Path("output")
 OUT.mkdir(exist_ok=True)
 SVG_PATH = OUT / "cat.svg"
 PNG_PATH = OUT / "cat.png"
+DISPLAY_PNG_PATH = OUT / "cat_display.png"
+FRAME_PATH = OUT / "cat.rgb565"
 JSON_PATH = OUT / "cat_of_the_day.json"
 STATE_PATH = OUT / "game_state.json"
+MANIFEST_PATH = OUT / "manifest.json"
 SLOTS = ["A", "B", "C", "D", "E"]
 
 
@@ -55,52 +164,31 @@ def _random_target() -> dict:
     return {s: random.choice(["dom", "rec"]) for s in SLOTS}
 
 
-def _load_state() -> dict:
-    if STATE_PATH.exists():
-        try:
-            return json.loads(STATE_PATH.read_text())
-        except Exception:
-            pass
-    return {}
+def _new_round_state(round_cfg: dict) -> dict:
+    return {"current_round_id": round_cfg["id"], "target_genotype": _random_target(), "advance_on_next_run": False}
 
 
-def _save_state(state: dict):
-    STATE_PATH.write_text(json.dumps(state, indent=2))
+def get_or_init_game_state(store: StateStore, round_override: int | None) -> StateStore:
+    store.load()
+    if round_override:
+        store.replace(_new_round_state(_round_by_id(round_override)))
+    elif "current_round_id" not in store or "target_genotype" not in store:
+        store.replace(_new_round_state(_default_round_for_today()))
+    return store
 
 
-def get_or_init_game_state(round_override: int | None) -> dict:
-    st = _load_state()
-    if round_override:
-        r = _round_by_id(round_override)
-        st = {"current_round_id": r["id"], "target_genotype": _random_target(), "advance_on_next_run": False}
-        _save_state(st)
-        return st
-    if "current_round_id" not in st or "target_genotype" not in st:
-        r = _default_round_for_today()
-        st = {"current_round_id": r["id"], "target_genotype": _random_target(), "advance_on_next_run": False}
-        _save_state(st)
-    return st
-
-
-def maybe_advance_round(state: dict) -> dict:
-    if not state.get("advance_on_next_run"):
-        return state
+def maybe_advance_round(store: StateStore) -> StateStore:
+    if not store.get("advance_on_next_run"):
+        return store
     ids = [r["id"] for r in ROUNDS]
-    cur = ids.index(state["current_round_id"])
-    nxt = ids[(cur + 1) % len(ids)]
-    new = {"current_round_id": nxt, "target_genotype": _random_target(), "advance_on_next_run": False}
-    _save_state(new)
-    return new
+    cur = ids.index(store["current_round_id"])
+    store.replace(_new_round_state(_round_by_id(ids[(cur + 1) % len(ids)])))
+    return store
 
 
 # ---------- Traits & image ----------
 def resolve_trait_labels(genotype: dict, round_cfg: dict) -> dict:
-    labels = {}
-    for t in round_cfg["traits"]:
-        slot = t["slot"]
-        allele = genotype.get(slot, "rec")
-        labels[slot] = t["dominant"] if allele == "dom" else t["recessive"]
-    return labels
+    return phenotype_labels(round_cfg, genotype_mask(genotype))
 
 
 def prompt_from_traits(labels: dict, round_cfg: dict) -> str:
@@ -112,18 +200,6 @@ def prompt_from_traits(labels: dict, round_cfg: dict) -> str:
     )
 
 
-def try_ai(prompt: str, save_png: Path) -> bool:
-    if not _USE_AI:
-        return False
-    try:
-        r = _openai.images.generate(model="gpt-image-1", prompt=prompt, size="1024x1024")
-        img_b64 = r.data[0].b64_json
-        save_png.write_bytes(base64.b64decode(img_b64))
-        return True
-    except Exception:
-        return False
-
-
 def fallback_svg(labels: dict, caption: str) -> str:
     return f"""<svg xmlns="http://www.w3.org/2000/svg" width="800" height="480">
       <rect width="100%" height="100%" fill="#111"/>
@@ -136,9 +212,288 @@ def fallback_svg(labels: dict, caption: str) -> str:
     </svg>"""
 
 
-def save_svg_png(svg: str):
-    SVG_PATH.write_text(svg, encoding="utf-8")
-    cairosvg.svg2png(bytestring=svg.encode("utf-8"), write_to=str(PNG_PATH))
+def caption_for(round_cfg: dict) -> str:
+    return f"Customer: {round_cfg['customer']}"
+
+
+def save_svg_png(
+    svg: str,
+    svg_path: Path = SVG_PATH,
+    png_path: Path = PNG_PATH,
+    display_png_path: Path = DISPLAY_PNG_PATH,
+):
+    svg_path.write_text(svg, encoding="utf-8")
+    svg2png = rasterizer.get()
+    with METRICS.span("rasterize"):
+        svg2png(bytestring=svg.encode("utf-8"), write_to=str(png_path))
+        svg2png(
+            bytestring=svg.encode("utf-8"),
+            write_to=str(display_png_path),
+            output_width=DISPLAY_WIDTH,
+            output_height=DISPLAY_HEIGHT,
+        )
+
+
+def save_display_png(src: Path, dest: Path = DISPLAY_PNG_PATH) -> bool:
+    """Downscale an AI PNG for the screen (needs Pillow); drops any stale copy on failure."""
+    try:
+        from PIL import Image
+
+        with Image.open(src) as im:
+            im.convert("RGB").resize((DISPLAY_WIDTH, DISPLAY_HEIGHT)).save(dest)
+        return True
+    except Exception:
+        dest.unlink(missing_ok=True)
+        return False
+
+
+def render_method() -> str:
+    return "layers" if RENDER_BACKEND == "layers" else "svg"
+
+
+def render_phenotype(labels: dict, caption: str, paths: dict, incremental: bool = False, on_dirty=None) -> str:
+    """
+    Render with RENDER_BACKEND into paths (svg/png/display_png/frame): "svg" rasterizes
+    fallback_svg via cairosvg, "layers" composites compose_svg's cached raster layers
+    (with incremental=True, only the box of the layers that changed since the last call).
+    on_dirty(box) is called before any file is written, with the changed display-space
+    box (empty if no layer changed) or None for a full redraw. Returns the method name
+    used for cache keys.
+    """
+    if render_method() == "layers":
+        from compose_svg import compose_svg
+        from PIL import Image
+
+        images, dirty = {}, None
+        comps = compositors.get()
+        with METRICS.span("composite"):
+            for name, comp in comps.items():
+                if incremental:
+                    images[name], box = comp.render_incremental(labels, caption)
+                    if name == "display_png":
+                        dirty = box or (0, 0, 0, 0)  # same layers: nothing to refresh
+                else:
+                    images[name] = comp.render(labels, caption)
+        if on_dirty:
+            on_dirty(dirty)
+        paths["svg"].write_text(compose_svg(labels, caption), encoding="utf-8")
+        with METRICS.span("encode"):
+            for name, img in images.items():
+                Image.fromarray(img, "RGB").save(paths[name], format="PNG")  # staged names have no .png suffix
+            write_frame_bytes(rgb_to_rgb565(images["display_png"]), paths["frame"])
+        return "layers"
+
+    if on_dirty:
+        on_dirty(None)
+    save_svg_png(fallback_svg(labels, caption), paths["svg"], paths["png"], paths["display_png"])
+    with METRICS.span("encode"):
+        write_frame(paths["display_png"], paths["frame"])
+    return "svg"
+
+
+manifest = Manifest(MANIFEST_PATH)
+_last_frame = None  # id of the last frame this process rendered or restored
+_pending_dirty = None  # its dirty record, until the manifest generation that publishes it
+
+
+def announce_frame(box: tuple | None = None) -> dict:
+    """Record the frame about to replace the last one (box: what changed, None = everything)."""
+    global _last_frame, _pending_dirty
+    _pending_dirty = dirty_record(_last_frame, box)
+    _last_frame = _pending_dirty["id"]
+    return _pending_dirty
+
+
+def _take_dirty() -> dict:
+    global _pending_dirty
+    dirty, _pending_dirty = _pending_dirty or announce_frame(None), None
+    return dirty
+
+
+def _layers_warm() -> bool:
+    return compositors.ready and compositors.get()["display_png"].has_previous
+
+
+def _forget_layers():
+    # Something other than the compositors was published: next layer render starts over
+    if compositors.ready:
+        for comp in compositors.get().values():
+            comp.forget()
+
+
+# ---------- AI images ----------
+_ai_listeners = []  # called with the cache key whenever an AI image lands in the cache
+_ai_wanted = None  # (cache key, future) of the AI image for the cat on screen, while pending
+
+
+def ai_cache() -> RenderCache:
+    return RenderCache(AI_CACHE_DIR, AI_CACHE_MAX_BYTES)
+
+
+def ai_key(labels: dict, round_cfg: dict) -> tuple[str, str]:
+    """(cache key, prompt): the key is the exact prompt, so identical cats share one image."""
+    prompt = prompt_from_traits(labels, round_cfg)
+    return ai_cache_key(prompt, AI_MODEL, AI_SIZE), prompt
+
+
+def _store_ai_result(key: str, png: bytes):
+    """Runs on the AI loop thread: file the image in the render cache, then notify listeners."""
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        paths = {"png": tmp / "cat.png", "display_png": tmp / "cat_display.png", "frame": tmp / "cat.rgb565"}
+        paths["png"].write_bytes(png)
+        save_display_png(paths["png"], paths["display_png"])
+        write_frame(paths["png"], paths["frame"])
+        ai_cache().store(key, **paths)
+    for cb in list(_ai_listeners):
+        cb(key)
+
+
+def ai_pending() -> bool:
+    return _ai_wanted is not None and not _ai_wanted[1].done()
+
+
+def await_ai(timeout: float | None = None) -> bool:
+    """Block until the pending AI image for the current cat is cached; False on failure/deadline."""
+    if _ai_wanted is None:
+        return False
+    with METRICS.span("ai.wait"):
+        return ai_pipeline.get().wait(_ai_wanted[1], timeout) is not None
+
+
+def render_cat(round_cfg: dict, genotype: dict, labels: dict, caption: str) -> str:
+    """
+    Publish cat.png (+ cat.svg / cat_display.png / cat.rgb565) for this phenotype.
+    A cache hit is a file copy; a miss renders and fills the cache. With the layer
+    backend warm (--daemon), a tile swap re-renders just the changed region instead.
+    With AI enabled and no cached AI image, the fallback is published now and the AI
+    request runs in the background (see await_ai / _ai_listeners); calling again once
+    it has landed swaps it in from the cache. Returns "ai", "svg" or "layers".
+    """
+    global _ai_wanted
+    _ai_wanted = None
+    if ai_enabled():
+        key, prompt = ai_key(labels, round_cfg)
+        if ai_cache().contains(key):
+            announce_frame(None)
+            _forget_layers()
+            if ai_cache().restore(key, png=PNG_PATH, display_png=DISPLAY_PNG_PATH, frame=FRAME_PATH):
+                METRICS.incr("ai_cache_hits")
+                return "ai"
+        fut = ai_pipeline.get().submit(key, prompt, on_result=_store_ai_result)
+        _ai_wanted = (key, fut)
+
+    cache = RenderCache()
+    method = render_method()
+    key = cache_key(round_cfg["id"], genotype, caption, method=method)
+    paths = {"svg": SVG_PATH, "png": PNG_PATH, "display_png": DISPLAY_PNG_PATH, "frame": FRAME_PATH}
+    warm = method == "layers" and _layers_warm()
+    if not warm and cache.contains(key):
+        announce_frame(None)
+        _forget_layers()
+        if cache.restore(key, **paths):
+            METRICS.incr("render_cache_hits")
+            return method
+    METRICS.incr("render_cache_misses")
+    # Render beside the published files, then rename them in: readers never see a partial PNG
+    staged = staged_paths(paths)
+    render_phenotype(labels, caption, staged, incremental=warm, on_dirty=announce_frame)
+    if not cache.contains(key):
+        cache.store(key, **staged)
+    publish_files(staged, paths)
+    return method
+
+
+def likely_next_genotypes(live: dict, target: dict) -> list[dict]:
+    """
+    Genotypes one tile flip away from the board, most likely first: flips toward the
+    target before flips away from it, and among those, empty slots (compute_matches
+    None) before slots that already hold a tile.
+    """
+    _, matches = compute_matches(live, target)
+    current = genotype_mask(allele_genotype(live))
+    away = current ^ genotype_mask(target)
+
+    def rank(slot: str) -> tuple[bool, bool]:
+        return not away & BIT[slot], matches[slot] is not None
+
+    return [genotype_dict(current ^ BIT[s]) for s in sorted(SLOTS, key=rank)]
+
+
+def prefetch_ai(prefetcher, round_cfg: dict, live: dict, target: dict) -> str | None:
+    """Idle time: start generating the most likely next cat that isn't cached yet."""
+    if ai_pending():
+        return None  # the cat on screen comes first
+    cache = ai_cache()
+    candidates = []
+    for genotype in likely_next_genotypes(live, target):
+        key, prompt = ai_key(resolve_trait_labels(genotype, round_cfg), round_cfg)
+        if not cache.contains(key):
+            candidates.append((key, prompt))
+    return prefetcher.offer(candidates, on_result=_store_ai_result)
+
+
+# ---------- Batch pre-render ----------
+def all_genotypes() -> list[dict]:
+    return [genotype_dict(mask) for mask in range(FULL + 1)]
+
+
+def render_to_cache(round_id: int, genotype: dict) -> float | None:
+    """Render one round × genotype into the cache. Returns seconds taken, or None if already cached."""
+    round_cfg = _round_by_id(round_id)
+    caption = caption_for(round_cfg)
+    key = cache_key(round_id, genotype, caption, method=render_method())
+    cache = RenderCache()
+    if cache.contains(key):
+        return None
+    t0 = time.perf_counter()
+    labels = resolve_trait_labels(genotype, round_cfg)
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        paths = {
+            "svg": tmp / "cat.svg",
+            "png": tmp / "cat.png",
+            "display_png": tmp / "cat_display.png",
+            "frame": tmp / "cat.rgb565",
+        }
+        render_phenotype(labels, caption, paths)
+        cache.store(key, **paths)
+    return time.perf_counter() - t0
+
+
+def prerender(jobs: int | None = None):
+    """
+    Warm the render cache with every ROUNDS × {dom,rec}^5 combination.
+    Safe to interrupt and re-run: entries already in the cache are skipped.
+    """
+    cache = RenderCache()
+    todo = []
+    for r in ROUNDS:
+        for g in all_genotypes():
+            if not cache.contains(cache_key(r["id"], g, caption_for(r), method=render_method())):
+                todo.append((r["id"], g))
+    total = len(ROUNDS) * 2 ** len(SLOTS)
+    print(f"[prerender] {total - len(todo)}/{total} cached, {len(todo)} to render on {jobs or os.cpu_count()} workers")
+
+    t0 = time.perf_counter()
+    rendered = 0
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {pool.submit(render_to_cache, rid, g): (rid, g) for rid, g in todo}
+        for fut in as_completed(futures):
+            rid, g = futures[fut]
+            code = genotype_code(genotype_mask(g))
+            secs = fut.result()
+            if secs is None:
+                print(f"  round {rid} {code}  skipped (cached)")
+                continue
+            rendered += 1
+            print(f"  round {rid} {code}  {secs:.2f}s")
+    wall = time.perf_counter() - t0
+    print(f"[prerender] rendered {rendered} in {wall:.1f}s wall ({wall / max(rendered, 1):.2f}s/item)")
+    keys = [cache_key(rid, g, caption_for(_round_by_id(rid)), method=render_method()) for rid, g in todo]
+    evicted = sum(not cache.contains(key) for key in keys)
+    if evicted:
+        print(f"[prerender] ⚠️ {evicted} evicted again: raise RENDER_CACHE_MAX_BYTES ({cache.max_bytes >> 20} MiB)")
 
 
 # ---------- Progress ----------
@@ -147,117 +502,368 @@ def compute_matches(live: dict, target: dict) -> tuple[int, dict]:
     live: {'A': {'allele': 'dom/rec/invalid/None', 'tile_id': 'A_DOM'/'A_REC'/None, ...}, ...}
     target: {'A':'dom', ...}
     """
+    board = pack_board(live)
+    allele_ok, id_ok, ok = match_masks(board, genotype_mask(target))
     matches = {}
-    correct = 0
     for slot in SLOTS:
-        allele = live[slot]["allele"]
-        tileid = live[slot]["tile_id"]
-        if allele not in ("dom", "rec"):
+        bit = BIT[slot]
+        if board.present & bit:
+            matches[slot] = {"allele_ok": bool(allele_ok & bit), "id_ok": bool(id_ok & bit), "ok": bool(ok & bit)}
+        else:
             matches[slot] = None
-            continue
-        allele_ok = allele == target[slot]
-        expected_id = TILE_ID_BY_SLOT[slot].get(target[slot])
-        id_ok = tileid == expected_id
-        ok = bool(allele_ok and id_ok)
-        matches[slot] = {"allele_ok": allele_ok, "id_ok": id_ok, "ok": ok}
-        if ok:
-            correct += 1
-    percent = int(round(100 * correct / len(SLOTS)))
+    percent = int(round(100 * POPCOUNT[ok] / len(SLOTS)))
     return percent, matches
 
 
-def sevenseg_show(percent: int):
-    if not _segdev:
-        return
+_outputs = None  # OutputDriver for the open board's LEDs + the 7-seg
+
+
+def outputs_for(gb):
+    global _outputs
+    if _outputs is None or _outputs.leds is not gb.leds:
+        from outputs import OutputDriver
+
+        _outputs = OutputDriver(gb.leds, sevenseg_device.get(), led_pins=gb.led_pins)
+    return _outputs
+
+
+def close_board(gb):
+    # Commit any coalesced LED / 7-seg update before GPIO is released
+    if _outputs is not None and _outputs.leds is gb.leds:
+        _outputs.close()
+    gb.close()
+
+
+# ---------- One cycle ----------
+def load_round_state(
+    store: StateStore, round_override: int | None = None, advance_now: bool = False
+) -> tuple[StateStore, dict]:
+    """Bring the store up to date for this run (new/advanced round); changes stay pending until flush()."""
+    with METRICS.span("state.load"):
+        get_or_init_game_state(store, round_override)
+        if advance_now:
+            store.update(advance_on_next_run=True)
+        maybe_advance_round(store)
+        return store, _round_by_id(store["current_round_id"])
+
+
+def sim_from_test(pairs: list[str]):
+    """Simulated board with the tiles from --test (e.g. A=dom B=rec) seated; other slots empty."""
+    from hardware import SimBackend
+
+    sim = SimBackend()
+    for kv in pairs:
+        k, v = kv.split("=")
+        sim.insert(k.upper(), v.lower())
+    return sim
+
+
+def board_backend(test: list[str] | None = None, record: str | None = None):
+    """
+    Backend for open_board(): simulated for --test with tiles, real by default (also for a
+    bare --test); wrapped in a trace recorder for --record.
+    """
+    backend = sim_from_test(test) if test else None
+    if record:
+        from board_trace import TraceRecorder
+
+        if backend is None:
+            from hardware import PiBackend
+
+            backend = PiBackend()
+        backend = TraceRecorder(backend, record)
+    return backend
+
+
+def allele_genotype(live: dict) -> dict:
+    return {s: (live[s]["allele"] or "rec") for s in SLOTS}
+
+
+def run_cycle(
+    gb,
+    state: StateStore,
+    current_round: dict,
+    live: dict,
+    render: bool = True,
+    wait_ai: bool = True,
+    kind: str | None = "nightly",
+) -> dict:
+    """
+    LEDs, progress and 7-seg for this board reading; with render=True also publish the cat,
+    cat_of_the_day.json and a new manifest generation, and append it to the history as
+    `kind` ("nightly" / "live"; None to skip). Pending game-state changes are flushed once
+    per cycle. The summary and manifest are published right after the first render; with
+    wait_ai, a pending AI image is then awaited (up to the deadline), swapped in and
+    published as a further generation; the daemon passes False and re-runs the cycle
+    when the image lands. Returns the progress summary (the full
+    payload when rendered). Stage timings so far are embedded in the payload and the
+    METRICS_TEXTFILE is refreshed after every cycle.
+    """
+    with METRICS.span("cycle"):
+        summary = _cycle(gb, state, current_round, live, render, wait_ai, kind)
+    METRICS.write_textfile()
+    return summary
+
+
+def _cycle(gb, state: StateStore, current_round: dict, live: dict, render: bool, wait_ai: bool, kind: str | None):
+    # Progress (allele + tile ID vs hidden target)
+    percent, matches = compute_matches(live, state["target_genotype"])
+
+    # Presence-only LEDs + 7-seg percent (optional): only what changed, rate-limited
+    outputs_for(gb).show(live, percent)
+
+    # If solved, schedule advance-on-next-run
+    if percent == 100 and not state.get("advance_on_next_run"):
+        state.update(current_round_id=current_round["id"], advance_on_next_run=True)
+    with METRICS.span("state.flush"):
+        state.flush()
+
+    if not render:
+        return {"progress_percent": percent, "matches_by_slot": matches}
+
+    # Build cat image (alleles-only → phenotype)
+    allele_only = allele_genotype(live)
+    labels = resolve_trait_labels(allele_only, current_round)
+    caption = caption_for(current_round)
+    with METRICS.span("render"):
+        used = render_cat(current_round, allele_only, labels, caption)
+    # Publish what we have now (the fallback while an AI image is pending); never block on the API
+    payload = _publish(current_round, live, labels, used, percent, matches, state)
+    if wait_ai and ai_pending() and await_ai():
+        used = render_cat(current_round, allele_only, labels, caption)  # cache hit → atomic swap-in
+        payload = _publish(current_round, live, labels, used, percent, matches, state)
+    if ai_enabled() and used != "ai":
+        METRICS.incr("ai_fallbacks")  # published without the AI image (pending, failed or late)
+
+    with METRICS.span("publish"):
+        if kind:
+            board = pack_board(live)
+            history.get().append(payload, board.genotype, board.to_int(), kind, png=DISPLAY_PNG_PATH)
+    print(f"🏁 Progress: {percent}%")
+    print(f"✅ Saved → {JSON_PATH}")
+    return payload
+
+
+def _publish(current_round: dict, live: dict, labels: dict, used: str, percent: int, matches: dict, state) -> dict:
+    # cat_of_the_day.json, then a new manifest generation for the files already in place
+    payload = cat_payload(current_round, live, labels, used, percent, matches, state)
+    payload["ai_pending"] = ai_pending()
+    if METRICS.enabled:
+        payload["metrics"] = METRICS.snapshot()
+    with METRICS.span("publish"):
+        atomic_write(JSON_PATH, json.dumps(payload, indent=2))
+        manifest.publish(
+            {"svg": SVG_PATH, "png": PNG_PATH, "display_png": DISPLAY_PNG_PATH, "frame": FRAME_PATH, "json": JSON_PATH},
+            round_id=current_round["id"],
+            method=used,
+            dirty=_take_dirty(),
+        )
+    return payload
+
+
+def cat_payload(
+    current_round: dict,
+    live: dict,
+    labels: dict,
+    method: str,
+    percent: int,
+    matches: dict,
+    state: StateStore,
+    png_path: Path = PNG_PATH,
+    svg_path: Path = SVG_PATH,
+) -> dict:
+    """cat_of_the_day.json contents for a published cat."""
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "round_id": current_round["id"],
+        "round_name": current_round["name"],
+        "customer": current_round["customer"],
+        "genotype_live": {s: live[s]["allele"] for s in SLOTS},
+        "tile_ids": {s: live[s]["tile_id"] for s in SLOTS},
+        "phenotype": labels,
+        "png": str(png_path),
+        "svg": str(svg_path) if svg_path.exists() else None,
+        "method": method,
+        "ai_pending": False,
+        "progress_percent": percent,
+        "matches_by_slot": matches,
+        "advance_on_next_run": state.get("advance_on_next_run", False),
+    }
+
+
+# ---------- Daemon ----------
+class _ControlHandler(socketserver.StreamRequestHandler):
+    # One command per connection: "nightly", "status" or "quit"
+    def handle(self):
+        cmd = self.rfile.readline().decode("utf-8").strip().lower()
+        if cmd in ("nightly", "quit"):
+            self.server.events.put((cmd, None))
+            reply = {"ok": True}
+        elif cmd == "status":
+            reply = {"ok": True, **self.server.status}
+        else:
+            reply = {"ok": False, "error": f"unknown command {cmd!r}"}
+        self.wfile.write((json.dumps(reply) + "\n").encode("utf-8"))
+
+
+def _start_control_socket(
+    events: queue.Queue, status: dict, path: str = DAEMON_SOCKET
+) -> socketserver.UnixStreamServer:
+    Path(path).unlink(missing_ok=True)
+    server = socketserver.ThreadingUnixStreamServer(path, _ControlHandler)
+    server.events = events
+    server.status = status
+    threading.Thread(target=server.serve_forever, name="control-socket", daemon=True).start()
+    return server
+
+
+def _next_event(events: queue.Queue, idle_after: float | None = None) -> tuple[str, dict | None]:
+    """Next event, with board bursts collapsed; ("idle", None) after `idle_after` quiet seconds."""
+    try:
+        kind, data = events.get(timeout=idle_after)
+    except queue.Empty:
+        return "idle", None
+    # Collapse a burst of board changes into the newest reading
+    while kind == "board":
+        try:
+            nxt = events.get_nowait()
+        except queue.Empty:
+            break
+        if nxt[0] != "board":
+            events.put(nxt)
+            break
+        kind, data = nxt
+    return kind, data
+
+
+def trigger_daemon(cmd: str = "nightly", path: str = DAEMON_SOCKET) -> bool:
+    """Client side of the control socket (e.g. from cron: generate_cat.py --trigger)."""
     try:
-        from luma.core.render import canvas
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(path)
+            sock.sendall(f"{cmd}\n".encode("utf-8"))
+            print(sock.makefile().readline().strip())
+        return True
+    except OSError as e:
+        print(f"No daemon on {path}: {e}")
+        return False
 
-        with canvas(_segdev) as draw:
-            draw.text((1, -1), f"{percent:3d}", fill="white")
-    except Exception:
-        pass
+
+def run_daemon(round_override: int | None = None, advance_now: bool = False, backend=None):
+    """
+    Long-running mode: imports, GPIO/SPI and game state stay warm. Board changes from
+    the background sampler update LEDs, 7-seg and progress right away; the cat is
+    re-rendered only when the (round, genotype) pair changes. The nightly round logic
+    runs on SIGUSR1 or a "nightly" command on DAEMON_SOCKET. With AI enabled, quiet
+    spells are used to prefetch the cats one tile flip away.
+    """
+    events = queue.Queue()
+    status = {"pid": os.getpid()}
+    store = StateStore(STATE_PATH)
+    state, current_round = load_round_state(store, round_override, advance_now)
+
+    gb = open_board(backend)
+    sampler = gb.start_sampler()
+    # subscribe() replays the current board, so the first cycle runs without a tile moving
+    sampler.subscribe(lambda t, live, prev: events.put(("board", live)))
+    _ai_listeners.append(lambda key: events.put(("ai", key)))
+    signal.signal(signal.SIGUSR1, lambda *_: events.put(("nightly", None)))
+    signal.signal(signal.SIGTERM, lambda *_: events.put(("quit", None)))
+    signal.signal(signal.SIGINT, lambda *_: events.put(("quit", None)))
+    server = _start_control_socket(events, status)
+    prefetcher = None
+    if ai_enabled():
+        from ai_pipeline import Prefetcher
+
+        prefetcher = Prefetcher(ai_pipeline.get())
+    print(f"🐈 Daemon running (pid {os.getpid()}, socket {DAEMON_SOCKET})")
+
+    rendered = None
+    last_live = None
+    try:
+        while True:
+            kind, data = _next_event(events, AI_PREFETCH_IDLE_SECONDS if prefetcher else None)
+            if kind == "quit":
+                break
+            if kind == "idle":
+                target = state["target_genotype"]
+                if last_live is not None and prefetch_ai(prefetcher, current_round, last_live, target):
+                    status["ai_prefetched_today"] = prefetcher.spent
+                continue
+            live = data
+            record = "live"
+            if kind == "nightly":
+                record = "nightly"
+                state, current_round = load_round_state(store)
+                live = sampler.latest_state() or sampler.wait_for_sample()
+                rendered = None  # always publish a fresh cat of the day
+            elif kind == "ai":
+                # AI image for the cat on screen is now cached: swap it in
+                if _ai_wanted is None or data != _ai_wanted[0] or last_live is None:
+                    continue
+                live, rendered, record = last_live, None, None  # same cat, better picture: not a new entry
+            key = (current_round["id"], genotype_mask(allele_genotype(live)))
+            summary = run_cycle(gb, state, current_round, live, render=key != rendered, wait_ai=False, kind=record)
+            rendered, last_live = key, live
+            status.update(
+                generation=manifest.generation,
+                round_id=current_round["id"],
+                progress_percent=summary["progress_percent"],
+                genotype_live={s: live[s]["allele"] for s in SLOTS},
+            )
+    finally:
+        server.shutdown()
+        server.server_close()
+        Path(DAEMON_SOCKET).unlink(missing_ok=True)
+        close_board(gb)
 
 
 # ---------- Main ----------
 def main():
     ap = argparse.ArgumentParser(description="Kitty CRISPR – sensors + LEDs + % + image")
-    ap.add_argument("--test", nargs="*", help="Mock alleles/tile_ids, e.g. --test A=dom B=rec C=dom")
+    ap.add_argument("--test", nargs="*", help="Simulated board with these tiles, e.g. --test A=dom B=rec (bare: real)")
     ap.add_argument("--round", type=int, help="Override round id (resets target)")
     ap.add_argument("--advance-now", action="store_true", help="Advance to next round immediately")
+    ap.add_argument("--prerender", action="store_true", help="Render every round × genotype into the cache and exit")
+    ap.add_argument("--jobs", type=int, help="Worker processes for --prerender (default: all cores)")
+    ap.add_argument("--daemon", action="store_true", help="Stay running and react to board changes")
+    ap.add_argument(
+        "--trigger", nargs="?", const="nightly", help="Send a command (default: nightly) to a running daemon"
+    )
+    ap.add_argument("--record", metavar="PATH", help="Record the raw board stream to a trace (see board_trace.py)")
+    ap.add_argument("--profile-startup", action="store_true", help="Report import/init time per subsystem")
     args = ap.parse_args()
+    try:
+        with METRICS.span("run"):
+            _run(args)
+    finally:
+        if ai_pipeline.ready:
+            ai_pipeline.get().close()
+        if args.profile_startup:
+            print_startup_profile()
+        if not (args.trigger or args.prerender):
+            METRICS.write_textfile()
 
-    state = get_or_init_game_state(args.round)
-    state = (
-        maybe_advance_round(state)
-        if not args.advance_now
-        else maybe_advance_round({"current_round_id": state["current_round_id"], "advance_on_next_run": True})
-    )
-    current_round = _round_by_id(state["current_round_id"])
 
-    gb = GeneBoard()
-    try:
-        # Read board (or test)
-        if args.test:
-            live = {}
-            for kv in args.test:
-                k, v = kv.split("=")
-                k = k.upper()
-                v = v.lower()
-                live[k] = {"allele": v, "tile_id": f"{k}_{v.upper()}", "volts": 0.0}
-            for s in SLOTS:
-                live.setdefault(s, {"allele": None, "tile_id": None, "volts": 0.0})
-        else:
-            live = gb.snapshot()
-
-        # Presence-only LEDs
-        gb.update_leds_presence(live)
-
-        # Progress (allele + tile ID vs hidden target)
-        percent, matches = compute_matches(live, state["target_genotype"])
-
-        # 7-seg percent (optional)
-        sevenseg_show(percent)
-
-        # Build cat image (alleles-only → phenotype)
-        allele_only = {s: (live[s]["allele"] or "rec") for s in SLOTS}
-        labels = resolve_trait_labels(allele_only, current_round)
-        caption = f"Customer: {current_round['customer']}"
-        used = "ai" if try_ai(prompt_from_traits(labels, current_round), PNG_PATH) else "svg"
-        if used == "svg":
-            svg = fallback_svg(labels, caption)
-            save_svg_png(svg)
-
-        # If solved, schedule advance-on-next-run
-        if percent == 100:
-            st = _load_state()
-            st["current_round_id"] = current_round["id"]
-            st["target_genotype"] = state["target_genotype"]
-            st["advance_on_next_run"] = True
-            _save_state(st)
-
-        # Save summary
-        now = datetime.now()
-        payload = {
-            "timestamp": now.isoformat(),
-            "round_id": current_round["id"],
-            "round_name": current_round["name"],
-            "customer": current_round["customer"],
-            "genotype_live": {s: live[s]["allele"] for s in SLOTS},
-            "tile_ids": {s: live[s]["tile_id"] for s in SLOTS},
-            "phenotype": labels,
-            "png": str(PNG_PATH),
-            "svg": str(SVG_PATH) if SVG_PATH.exists() else None,
-            "method": used,
-            "progress_percent": percent,
-            "matches_by_slot": matches,
-            "advance_on_next_run": _load_state().get("advance_on_next_run", False),
-        }
-        JSON_PATH.write_text(json.dumps(payload, indent=2))
-        print(f"🏁 Progress: {percent}%")
-        print(f"✅ Saved → {JSON_PATH}")
+def _run(args):
+    if args.prerender:
+        prerender(args.jobs)
+        return
+    if args.trigger:
+        raise SystemExit(0 if trigger_daemon(args.trigger) else 1)
+    if args.daemon:
+        run_daemon(args.round, args.advance_now, board_backend(args.test, args.record))
+        return
 
+    state, current_round = load_round_state(StateStore(STATE_PATH), args.round, args.advance_now)
+
+    # --test runs the real read/decode path against a simulated board
+    gb = open_board(board_backend(args.test, args.record))
+    try:
+        live = gb.read_with_retries()
+        run_cycle(gb, state, current_round, live)
     finally:
-        gb.close()
+        close_board(gb)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,118 @@
+# genotype.py
+# Compact genotypes: one bit per slot in SLOTS order (A = bit 0). A genotype is a 5-bit
+# mask of "dom" slots; a board reading packs into five such masks (BoardMask), so
+# matching against a target is a few ANDs/XORs and a 32-entry popcount lookup.
+from typing import NamedTuple
+
+from config import ROUNDS, TILE_ID_BY_SLOT
+
+SLOTS = ["A", "B", "C", "D", "E"]
+BIT = {s: 1 << i for i, s in enumerate(SLOTS)}
+FULL = (1 << len(SLOTS)) - 1
+POPCOUNT = bytes(bin(m).count("1") for m in range(FULL + 1))
+
+
+# ---------- Genotypes ----------
+def genotype_mask(genotype: dict) -> int:
+    """{'A': 'dom', ...} → dom bits; anything but "dom" (rec, empty, invalid) reads as rec."""
+    return sum(BIT[s] for s in SLOTS if genotype.get(s) == "dom")
+
+
+def genotype_dict(mask: int) -> dict:
+    return {s: "dom" if mask & BIT[s] else "rec" for s in SLOTS}
+
+
+def genotype_code(mask: int) -> str:
+    """Short human-readable form, e.g. "DRDRR"."""
+    return "".join("D" if mask & BIT[s] else "R" for s in SLOTS)
+
+
+def code_mask(code: str) -> int:
+    """Inverse of genotype_code."""
+    return sum(BIT[s] for s, c in zip(SLOTS, code) if c == "D")
+
+
+# ---------- Board readings ----------
+class BoardMask(NamedTuple):
+    present: int  # a tile is seated (allele dom or rec)
+    dom: int  # allele reads dom
+    invalid: int  # both Hall pins active
+    tile_dom: int  # tile ID is the slot's dom tile (TILE_ID_BY_SLOT)
+    tile_rec: int  # tile ID is the slot's rec tile
+
+    @property
+    def genotype(self) -> int:
+        """Allele-only genotype as shown on screen (empty/invalid slots count as rec)."""
+        return self.dom
+
+    def to_int(self) -> int:
+        """25-bit integer, e.g. for history records or state files."""
+        return sum(field << (5 * i) for i, field in enumerate(self))
+
+    @classmethod
+    def from_int(cls, packed: int) -> "BoardMask":
+        return cls(*((packed >> (5 * i)) & FULL for i in range(len(cls._fields))))
+
+
+def pack_board(live: dict) -> BoardMask:
+    """snapshot() / read_with_retries() shape → BoardMask."""
+    present = dom = invalid = tile_dom = tile_rec = 0
+    for s in SLOTS:
+        info = live.get(s) or {}
+        allele, tile = info.get("allele"), info.get("tile_id")
+        if allele in ("dom", "rec"):
+            present |= BIT[s]
+            if allele == "dom":
+                dom |= BIT[s]
+        elif allele == "invalid":
+            invalid |= BIT[s]
+        if tile is not None:
+            if tile == TILE_ID_BY_SLOT[s]["dom"]:
+                tile_dom |= BIT[s]
+            elif tile == TILE_ID_BY_SLOT[s]["rec"]:
+                tile_rec |= BIT[s]
+    return BoardMask(present, dom, invalid, tile_dom, tile_rec)
+
+
+def match_masks(board: BoardMask, target: int) -> tuple[int, int, int]:
+    """(allele_ok, id_ok, ok) masks of seated slots against a target genotype mask."""
+    allele_ok = board.present & ~(board.dom ^ target) & FULL
+    id_ok = board.present & ((board.tile_dom & target) | (board.tile_rec & ~target))
+    return allele_ok, id_ok, allele_ok & id_ok
+
+
+def match_percent(board: BoardMask, target: int) -> int:
+    return int(round(100 * POPCOUNT[match_masks(board, target)[2]] / len(SLOTS)))
+
+
+def match_counts(packed, target: int):
+    """
+    Correct slots for many boards at once: packed is a sequence (or NumPy array) of
+    BoardMask.to_int() values. Returns a NumPy array when NumPy is available.
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        return [POPCOUNT[match_masks(BoardMask.from_int(p), target)[2]] for p in packed]
+    p = np.asarray(packed, dtype=np.uint32)
+    present, dom, tile_dom, tile_rec = ((p >> shift) & FULL for shift in (0, 5, 15, 20))
+    ok = present & ~(dom ^ target) & ((tile_dom & target) | (tile_rec & (~target & FULL)))
+    return np.frombuffer(POPCOUNT, dtype=np.uint8)[ok & FULL]
+
+
+# ---------- Phenotypes ----------
+def phenotype_table(round_cfg: dict) -> tuple[dict, ...]:
+    """Trait labels for each of the 32 genotype masks of a round."""
+    return tuple(
+        {t["slot"]: t["dominant"] if mask & BIT[t["slot"]] else t["recessive"] for t in round_cfg["traits"]}
+        for mask in range(FULL + 1)
+    )
+
+
+PHENOTYPES = {r["id"]: phenotype_table(r) for r in ROUNDS}
+
+
+def phenotype_labels(round_cfg: dict, mask: int) -> dict:
+    """Labels for a genotype mask; a copy, so callers may keep or modify it."""
+    table = PHENOTYPES.get(round_cfg["id"]) or phenotype_table(round_cfg)
+    return dict(table[mask])
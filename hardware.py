@@ -0,0 +1,187 @@
+# hardware.py
+# What GeneBoard needs from the Pi: GPIO pins (Hall inputs, LEDs, edge callbacks) and
+# the MCP3008 on SPI. PiBackend is the real thing (RPi.GPIO + spidev, imported only
+# when used); SimBackend models the board in software so the whole sampling and
+# generation path runs — and can be timed — on an ordinary Linux box.
+import random, threading, time
+
+from config import HALL_PINS, ADC_CHANNEL, TILE_ID_BY_SLOT, SIM_ADC_NOISE_CODES, SIM_SPI_LATENCY_US, ADC_LUT_PATH
+
+LOW, HIGH = 0, 1  # Hall sensors pull LOW when a magnet is present
+
+
+class PiBackend:
+    """
+    RPi.GPIO in BCM mode + spidev for the MCP3008 (default SPI0 CE0). Several can share
+    one Pi (stations.py): close() only releases the pins this backend set up.
+    """
+
+    def __init__(self, spi_bus: int = 0, spi_device: int = 0, spi_hz: int = 1_000_000):
+        import RPi.GPIO as GPIO
+        import spidev
+
+        self.GPIO = GPIO
+        GPIO.setmode(GPIO.BCM)
+        self.spi = spidev.SpiDev()
+        self.spi.open(spi_bus, spi_device)
+        self.spi.max_speed_hz = spi_hz
+        self.xfer = self.spi.xfer2  # MCP3008 frame in, response bytes out
+        self.read = GPIO.input
+        self.write = GPIO.output
+        self.pins = set()
+
+    def setup_input(self, pin: int):
+        self.GPIO.setup(pin, self.GPIO.IN, pull_up_down=self.GPIO.PUD_UP)
+        self.pins.add(pin)
+
+    def setup_output(self, pin: int, level: int):
+        self.GPIO.setup(pin, self.GPIO.OUT, initial=level)
+        self.pins.add(pin)
+
+    def watch(self, pin: int, callback):
+        """callback(pin) on every edge, from RPi.GPIO's callback thread."""
+        self.GPIO.add_event_detect(pin, self.GPIO.BOTH, callback=callback)
+
+    def unwatch(self, pin: int):
+        self.GPIO.remove_event_detect(pin)
+
+    def close(self):
+        try:
+            self.spi.close()
+        finally:
+            if self.pins:
+                self.GPIO.cleanup(sorted(self.pins))
+
+
+def _tile_codes(lut_path: str = ADC_LUT_PATH) -> dict[str, int]:
+    # Middle of each tile's raw-code band in the decoder GeneBoard will use, so
+    # simulated tiles decode the same way calibrated real ones do
+    from calibration import TileDecoder
+
+    out = {}
+    for slot, (table, labels) in TileDecoder.load(lut_path).tables.items():
+        for i, label in enumerate(labels):
+            codes = [c for c, v in enumerate(table) if v == i + 1]
+            if codes:
+                out[label] = codes[len(codes) // 2]
+    return out
+
+
+class SimBackend:
+    """
+    Simulated board: Hall pin levels, MCP3008 raw codes with Gaussian noise (sigma in
+    codes) and a per-transfer SPI latency. insert()/remove() seat or pull tiles (with
+    optional contact bounce) and fire edge callbacks like RPi.GPIO would; play() runs a
+    timed script of such events on a background thread.
+    """
+
+    def __init__(
+        self,
+        noise_codes: float = SIM_ADC_NOISE_CODES,
+        spi_latency_us: float = SIM_SPI_LATENCY_US,
+        seed: int | None = None,
+        hall_pins: dict = HALL_PINS,
+        adc_channel: dict = ADC_CHANNEL,
+        lut_path: str = ADC_LUT_PATH,
+    ):
+        self.noise = noise_codes
+        self.latency = spi_latency_us / 1e6
+        self.rng = random.Random(seed)
+        self.levels = {}  # pin → level
+        self.outputs = {}  # output pin → level (LEDs)
+        self.hall_pins = hall_pins
+        self.adc_channel = adc_channel
+        self.codes = {ch: 0 for ch in adc_channel.values()}  # channel → raw code (no tile: 0)
+        self.tile_codes = _tile_codes(lut_path)
+        self.transfers = 0
+        self._callbacks = {}
+        self._lock = threading.Lock()
+        for pins in hall_pins.values():
+            for pin in pins.values():
+                self.levels[pin] = HIGH
+
+    # ----- Backend interface -----
+    def setup_input(self, pin: int):
+        self.levels.setdefault(pin, HIGH)
+
+    def setup_output(self, pin: int, level: int):
+        self.outputs[pin] = level
+
+    def read(self, pin: int) -> int:
+        return self.levels.get(pin, HIGH)
+
+    def write(self, pin: int, level: int):
+        self.outputs[pin] = level
+
+    def watch(self, pin: int, callback):
+        self._callbacks[pin] = callback
+
+    def unwatch(self, pin: int):
+        self._callbacks.pop(pin, None)
+
+    def xfer(self, cmd: list[int]) -> list[int]:
+        if self.latency:
+            deadline = time.perf_counter() + self.latency
+            while time.perf_counter() < deadline:
+                pass  # sub-millisecond: spin like the real ioctl would block
+        self.transfers += 1
+        ch = (cmd[1] >> 4) & 7
+        code = self.codes.get(ch, 0)
+        if code and self.noise:
+            code = min(1023, max(0, round(self.rng.gauss(code, self.noise))))
+        return [0, (code >> 8) & 3, code & 0xFF]
+
+    def close(self):
+        self._callbacks.clear()
+
+    # ----- Scenario control -----
+    def _set_pin(self, pin: int, level: int):
+        with self._lock:
+            changed = self.levels.get(pin) != level
+            self.levels[pin] = level
+            cb = self._callbacks.get(pin)
+        if changed and cb:
+            cb(pin)
+
+    def set_allele(self, slot: str, allele: str | None, bounce: int = 0, bounce_ms: float = 1.0):
+        """Hall pins for allele dom / rec / invalid (both) / None; bounce toggles the pins first."""
+        pins = self.hall_pins[slot]
+        want = {
+            pins["dom"]: LOW if allele in ("dom", "invalid") else HIGH,
+            pins["rec"]: LOW if allele in ("rec", "invalid") else HIGH,
+        }
+        old = {pin: self.read(pin) for pin in want}
+        for i in range(bounce):
+            for pin, level in want.items():
+                if level != old[pin]:
+                    self._set_pin(pin, level if i % 2 == 0 else old[pin])
+            time.sleep(bounce_ms / 1000.0)
+        for pin, level in want.items():
+            self._set_pin(pin, level)
+
+    def insert(self, slot: str, allele: str, tile: str | None = None, bounce: int = 0):
+        """Seat a tile: ADC code of `tile` (default: the matching tile for the allele), then the magnet."""
+        tile = tile or TILE_ID_BY_SLOT[slot].get(allele)
+        self.codes[self.adc_channel[slot]] = self.tile_codes.get(tile, 0)
+        self.set_allele(slot, allele, bounce)
+
+    def remove(self, slot: str, bounce: int = 0):
+        self.set_allele(slot, None, bounce)
+        self.codes[self.adc_channel[slot]] = 0
+
+    def play(self, script: list[tuple], speed: float = 1.0) -> threading.Thread:
+        """
+        Run [(t, "insert", slot, allele[, tile]) | (t, "remove", slot)] on a thread,
+        t in seconds from now (divided by speed; speed=0 means no waiting).
+        """
+
+        def run():
+            t0 = time.monotonic()
+            for t, action, slot, *args in sorted(script, key=lambda e: e[0]):
+                if speed:
+                    time.sleep(max(0.0, t0 + t / speed - time.monotonic()))
+                getattr(self, action)(slot, *args)
+
+        thread = threading.Thread(target=run, name="sim-script", daemon=True)
+        thread.start()
+        return thread
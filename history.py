@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# history.py
+# Append-only log of every published cat (nightly and live play): one JSON line per cat
+# in cats.jsonl, plus a fixed-size binary index (cats.idx) so queries seek straight to
+# the records they need instead of reading years of history into memory.
+#   python3 history.py last 10 | solved | times
+import argparse, json, os, shutil, struct
+from datetime import date, datetime
+from pathlib import Path
+from typing import NamedTuple
+
+from config import HISTORY_DIR
+from genotype import genotype_code, code_mask
+
+# byte offset in cats.jsonl, unix time, date ordinal, round id, genotype mask, percent, flags
+_INDEX = struct.Struct("<QdIHBBB")
+SOLVED = 1
+LIVE = 2
+_BLOCK = 4096  # index entries read per chunk when scanning
+
+
+class IndexEntry(NamedTuple):
+    offset: int
+    ts: float
+    day: int  # date.toordinal()
+    round_id: int
+    genotype: int
+    percent: int
+    flags: int
+
+
+def _index_bytes(offset: int, rec: dict) -> bytes:
+    ts = datetime.fromisoformat(rec["ts"])
+    flags = (SOLVED if rec["percent"] == 100 else 0) | (LIVE if rec["kind"] == "live" else 0)
+    return _INDEX.pack(
+        offset, ts.timestamp(), ts.toordinal(), rec["round"], code_mask(rec["genotype"]), rec["percent"], flags
+    )
+
+
+def _timestamp(t: datetime | date) -> float:
+    return (t if isinstance(t, datetime) else datetime.combine(t, datetime.min.time())).timestamp()
+
+
+class History:
+    """
+    append() adds a record; last(), between(), solved() and solve_times() answer from
+    the index and only parse the JSON lines they return. Entries are in append order,
+    so time-range lookups are a binary search over the index.
+    """
+
+    def __init__(self, root: str | Path = HISTORY_DIR):
+        self.root = Path(root)
+        self.png_dir = self.root / "png"
+        self.png_dir.mkdir(parents=True, exist_ok=True)
+        self.log_path = self.root / "cats.jsonl"
+        self.idx_path = self.root / "cats.idx"
+        self._repair()
+
+    # ----- Writing -----
+    def append(self, payload: dict, genotype: int, board: int, kind: str = "nightly", png: Path | None = None) -> dict:
+        """
+        Record one published cat (generate_cat's payload) and archive its display PNG.
+        genotype: allele genotype mask; board: BoardMask.to_int(); kind: "nightly" or "live".
+        """
+        rec = {
+            "ts": payload["timestamp"],
+            "round": payload["round_id"],
+            "genotype": genotype_code(genotype),
+            "board": board,
+            "percent": payload["progress_percent"],
+            "method": payload["method"],
+            "kind": kind,
+            "png": self._archive(png, payload["round_id"], genotype, payload["method"]) if png else None,
+        }
+        line = (json.dumps(rec, separators=(",", ":")) + "\n").encode("utf-8")
+        with open(self.log_path, "ab") as f:
+            offset = f.tell()
+            f.write(line)
+        with open(self.idx_path, "ab") as f:
+            f.write(_index_bytes(offset, rec))
+        return rec
+
+    def _archive(self, png: Path, round_id: int, genotype: int, method: str) -> str | None:
+        # Same round + genotype + method is the same picture: keep one copy
+        dest = self.png_dir / f"r{round_id}-{genotype_code(genotype)}-{method}.png"
+        if not dest.exists():
+            try:
+                tmp = dest.with_name(f".{dest.name}.tmp")
+                shutil.copyfile(png, tmp)
+                os.replace(tmp, dest)
+            except OSError:
+                return None
+        return str(dest.relative_to(self.root))
+
+    def _repair(self):
+        # A crash between the two appends leaves log lines the index doesn't know about
+        size = self.idx_path.stat().st_size if self.idx_path.exists() else 0
+        if size % _INDEX.size:
+            os.truncate(self.idx_path, size - size % _INDEX.size)
+        n = len(self)
+        end = 0
+        if n:
+            last = self.entry(n - 1)
+            with open(self.log_path, "rb") as f:
+                f.seek(last.offset)
+                end = last.offset + len(f.readline())
+        if not self.log_path.exists() or self.log_path.stat().st_size <= end:
+            return
+        with open(self.log_path, "rb") as f, open(self.idx_path, "ab") as idx:
+            f.seek(end)
+            while line := f.readline():
+                if not line.endswith(b"\n"):
+                    os.truncate(self.log_path, end)  # torn final line
+                    break
+                idx.write(_index_bytes(end, json.loads(line)))
+                end += len(line)
+
+    # ----- Index access -----
+    def __len__(self) -> int:
+        return self.idx_path.stat().st_size // _INDEX.size if self.idx_path.exists() else 0
+
+    def entry(self, i: int) -> IndexEntry:
+        with open(self.idx_path, "rb") as f:
+            f.seek(i * _INDEX.size)
+            return IndexEntry._make(_INDEX.unpack(f.read(_INDEX.size)))
+
+    def entries(self, start: int = 0, stop: int | None = None):
+        """Index entries [start, stop) in append order, read a block at a time."""
+        stop = len(self) if stop is None else min(stop, len(self))
+        if start >= stop:
+            return
+        with open(self.idx_path, "rb") as f:
+            f.seek(start * _INDEX.size)
+            i = start
+            while i < stop:
+                n = min(_BLOCK, stop - i)
+                for e in _INDEX.iter_unpack(f.read(n * _INDEX.size)):
+                    yield IndexEntry._make(e)
+                i += n
+
+    def records(self, entries) -> list[dict]:
+        """Parse the JSON lines for these index entries (one seek each)."""
+        out = []
+        with open(self.log_path, "rb") as f:
+            for e in entries:
+                f.seek(e.offset)
+                out.append(json.loads(f.readline()))
+        return out
+
+    def find(self, ts: float) -> int:
+        """Position of the first entry at or after unix time ts (binary search on the index)."""
+        lo, hi = 0, len(self)
+        with open(self.idx_path, "rb") as f:
+            while lo < hi:
+                mid = (lo + hi) // 2
+                f.seek(mid * _INDEX.size)
+                if _INDEX.unpack(f.read(_INDEX.size))[1] < ts:
+                    lo = mid + 1
+                else:
+                    hi = mid
+        return lo
+
+    # ----- Queries -----
+    def last(self, n: int = 10) -> list[dict]:
+        """Newest n cats, newest first."""
+        total = len(self)
+        return self.records(reversed(list(self.entries(max(0, total - n), total))))
+
+    def between(self, start: datetime | date, end: datetime | date) -> list[dict]:
+        """Cats published in [start, end), oldest first."""
+        return self.records(self.entries(self.find(_timestamp(start)), self.find(_timestamp(end))))
+
+    def solved(self, round_id: int | None = None) -> list[dict]:
+        """Every cat that completed its round (100%), optionally for one round only."""
+        return self.records(
+            e for e in self.entries() if e.flags & SOLVED and (round_id is None or e.round_id == round_id)
+        )
+
+    def solve_times(self) -> list[dict]:
+        """
+        Per round played: when it started (first cat of a run of the same round id),
+        when it was first solved, and the seconds in between. Index-only; no JSON parsing.
+        """
+        out = []
+        current = None
+        for e in self.entries():
+            if current is None or e.round_id != current["round_id"]:
+                current = {"round_id": e.round_id, "started": e.ts, "solved": None, "seconds": None}
+                out.append(current)
+            if e.flags & SOLVED and current["solved"] is None:
+                current["solved"] = e.ts
+                current["seconds"] = round(e.ts - current["started"], 1)
+        for row in out:
+            row["started"] = datetime.fromtimestamp(row["started"]).isoformat(timespec="seconds")
+            if row["solved"] is not None:
+                row["solved"] = datetime.fromtimestamp(row["solved"]).isoformat(timespec="seconds")
+        return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Query the history of generated cats")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("last", help="Most recent cats").add_argument("n", type=int, nargs="?", default=10)
+    sub.add_parser("solved", help="Cats that solved their round").add_argument("--round", type=int)
+    sub.add_parser("times", help="Per-round solve times")
+    args = ap.parse_args()
+
+    h = History()
+    if args.cmd == "last":
+        rows = h.last(args.n)
+    elif args.cmd == "solved":
+        rows = h.solved(args.round)
+    else:
+        rows = h.solve_times()
+    for row in rows:
+        print(json.dumps(row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+# metrics.py
+# Where a run's time goes: monotonic spans per stage (GPIO setup, ADC sampling, Hall
+# votes, AI, rasterizing, file writes), event counters, and a ring of recent latencies
+# per stage. Exported as a Prometheus textfile (node_exporter's textfile collector) and
+# embedded in cat_of_the_day.json. When disabled, span() returns one shared no-op
+# context manager and record()/incr() return at once.
+import os, threading, time
+from collections import deque
+
+from config import METRICS_ENABLED, METRICS_RING_SIZE, METRICS_TEXTFILE
+from state_store import atomic_write
+
+PREFIX = "kitty"
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("metrics", "stage", "t0")
+
+    def __init__(self, metrics: "Metrics", stage: str):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.record(self.stage, time.perf_counter() - self.t0)
+        return False
+
+
+class _Stage:
+    __slots__ = ("count", "total", "max", "last", "recent")
+
+    def __init__(self, ring_size: int):
+        self.count = 0
+        self.total = self.max = self.last = 0.0
+        self.recent = deque(maxlen=ring_size)
+
+
+def _quantile(values: list[float], q: float) -> float:
+    # Nearest rank over sorted values
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 3)
+
+
+class Metrics:
+    """
+    Process-wide stage timings and counters; safe to use from any thread.
+      with METRICS.span("board.read"): ...   # also recorded when the block raises
+      METRICS.incr("board_retries", n)
+    """
+
+    def __init__(self, enabled: bool = METRICS_ENABLED, ring_size: int = METRICS_RING_SIZE):
+        self.enabled = enabled
+        self.ring_size = ring_size
+        self.started = time.time()
+        self._stages = {}  # stage → _Stage
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def span(self, stage: str):
+        return _Span(self, stage) if self.enabled else _NULL_SPAN
+
+    def record(self, stage: str, seconds: float):
+        if not self.enabled:
+            return
+        with self._lock:
+            st = self._stages.get(stage)
+            if st is None:
+                st = self._stages[stage] = _Stage(self.ring_size)
+            st.count += 1
+            st.total += seconds
+            st.last = seconds
+            st.max = max(st.max, seconds)
+            st.recent.append(seconds)
+
+    def incr(self, name: str, n: int = 1):
+        if not self.enabled or not n:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+            self._counters.clear()
+            self.started = time.time()
+
+    def _copy(self):
+        with self._lock:
+            stages = {
+                name: (st.count, st.total, st.max, st.last, sorted(st.recent))
+                for name, st in sorted(self._stages.items())
+            }
+            return stages, dict(sorted(self._counters.items()))
+
+    def snapshot(self) -> dict:
+        """Per stage: count, last / mean / max and p50 / p90 of the recent ring (ms); plus counters."""
+        stages, counters = self._copy()
+        return {
+            "since": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+            "stages": {
+                name: {
+                    "count": count,
+                    "last_ms": _ms(last),
+                    "mean_ms": _ms(total / count),
+                    "max_ms": _ms(mx),
+                    "p50_ms": _ms(_quantile(recent, 0.5)),
+                    "p90_ms": _ms(_quantile(recent, 0.9)),
+                }
+                for name, (count, total, mx, last, recent) in stages.items()
+            },
+            "counters": counters,
+        }
+
+    def prometheus(self) -> str:
+        """Prometheus text exposition format: one summary over stages, one counter per event."""
+        stages, counters = self._copy()
+        name = f"{PREFIX}_stage_seconds"
+        lines = [
+            f"# HELP {name} Time per stage; quantiles over its last {self.ring_size} runs.",
+            f"# TYPE {name} summary",
+        ]
+        for stage, (count, total, _mx, _last, recent) in stages.items():
+            for q in QUANTILES:
+                lines.append(f'{name}{{stage="{stage}",quantile="{q}"}} {_quantile(recent, q):.6f}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {total:.6f}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {count}')
+        lines += [f"# HELP {name}_max Slowest run of each stage.", f"# TYPE {name}_max gauge"]
+        lines += [f'{name}_max{{stage="{stage}"}} {s[2]:.6f}' for stage, s in stages.items()]
+        for counter, value in counters.items():
+            lines += [f"# TYPE {PREFIX}_{counter}_total counter", f"{PREFIX}_{counter}_total {value}"]
+        start = f"{PREFIX}_metrics_start_time_seconds"
+        lines += [f"# TYPE {start} gauge", f"{start} {self.started:.0f}"]
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path: str = METRICS_TEXTFILE) -> bool:
+        """Publish prometheus() atomically (the textfile collector must never see half a file)."""
+        if not self.enabled:
+            return False
+        atomic_write(path, self.prometheus(), fsync=False)
+        return True
+
+
+METRICS = Metrics(enabled=METRICS_ENABLED and os.getenv("KITTY_METRICS", "1") != "0")
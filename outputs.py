@@ -0,0 +1,159 @@
+# outputs.py
+# Change-detecting drivers for the slot LEDs and the MAX7219 7-segment: each remembers
+# what the hardware last committed and writes only what differs. OutputDriver coalesces
+# bursts of updates (e.g. from the board sampler) under a maximum refresh rate.
+import threading, time, traceback
+
+from config import LED_PINS, OUTPUT_MAX_RATE_HZ, SEVENSEG_DIGITS, SEVENSEG_INTENSITY
+
+# MAX7219 registers (datasheet table 2); digit 0 is the rightmost
+_REG_DIGIT0 = 0x01
+_REG_DECODE = 0x09
+_REG_INTENSITY = 0x0A
+_REG_SCAN_LIMIT = 0x0B
+_REG_SHUTDOWN = 0x0C
+_REG_TEST = 0x0F
+_CODE_B = {**{str(d): d for d in range(10)}, "-": 0x0A, " ": 0x0F}
+
+
+def presence_levels(live: dict, led_pins: dict = LED_PINS) -> dict[int, int]:
+    """Pin → level for presence-only LEDs: green if a tile is seated (dom/rec), red otherwise."""
+    levels = {}
+    for slot, info in live.items():
+        seated = info.get("allele") in ("dom", "rec")
+        levels[led_pins[slot]["green"]] = int(seated)
+        levels[led_pins[slot]["red"]] = int(not seated)
+    return levels
+
+
+class LedBank:
+    """write(pin, level) only for pins whose level differs from the last committed one."""
+
+    def __init__(self, write, initial: dict[int, int] | None = None):
+        self.write = write
+        self.committed = dict(initial or {})
+
+    def apply(self, levels: dict[int, int]) -> int:
+        """Returns the number of pins written."""
+        n = 0
+        for pin, level in levels.items():
+            if self.committed.get(pin) != level:
+                self.write(pin, level)
+                self.committed[pin] = level
+                n += 1
+        return n
+
+    def invalidate(self):
+        # After a failed write the hardware state is unknown: rewrite everything next time
+        self.committed.clear()
+
+
+class SevenSegment:
+    """
+    MAX7219 in Code-B decode mode: one 2-byte SPI write per changed digit.
+    xfer is a spidev-style xfer2 (e.g. SpiDev on CE1).
+    """
+
+    def __init__(self, xfer, digits: int = SEVENSEG_DIGITS, intensity: int = SEVENSEG_INTENSITY):
+        self.xfer = xfer
+        self.digits = digits
+        self.intensity = intensity
+        self.committed = [None] * digits
+        self._setup()
+
+    def _setup(self):
+        for reg, value in (
+            (_REG_TEST, 0),
+            (_REG_SCAN_LIMIT, self.digits - 1),
+            (_REG_DECODE, (1 << self.digits) - 1),
+            (_REG_INTENSITY, self.intensity),
+            (_REG_SHUTDOWN, 1),
+        ):
+            self.xfer([reg, value])
+
+    def apply(self, text: str) -> int:
+        """Show text (right-aligned digits, '-' or ' '); returns the number of digits written."""
+        if self.committed is None:
+            self._setup()  # chip may have reset along with whatever made the last write fail
+            self.committed = [None] * self.digits
+        codes = [_CODE_B.get(c, 0x0F) for c in text[-self.digits :].rjust(self.digits)]
+        n = 0
+        for i, code in enumerate(reversed(codes)):
+            if self.committed[i] != code:
+                self.xfer([_REG_DIGIT0 + i, code])
+                self.committed[i] = code
+                n += 1
+        return n
+
+    def invalidate(self):
+        self.committed = None
+
+
+class OutputDriver:
+    """
+    show(live, percent) records the wanted LED and 7-seg state. It is committed right away
+    if the last commit is at least 1/max_rate_hz old, otherwise once that interval has
+    passed (only the newest state is written). Write errors are logged, not raised, and
+    make the next commit rewrite everything.
+    """
+
+    def __init__(
+        self,
+        leds: LedBank | None,
+        sevenseg: SevenSegment | None,
+        max_rate_hz: float = OUTPUT_MAX_RATE_HZ,
+        led_pins: dict = LED_PINS,
+    ):
+        self.leds = leds
+        self.sevenseg = sevenseg
+        self.led_pins = led_pins
+        self.period = 1.0 / max_rate_hz
+        self.writes = 0  # pins + digits written so far
+        self._lock = threading.Lock()
+        self._wanted_leds = None
+        self._wanted_text = None
+        self._last = 0.0
+        self._timer = None
+        self._errors = {}  # device → last reported error
+
+    def show(self, live: dict | None = None, percent: int | None = None):
+        with self._lock:
+            if live is not None:
+                self._wanted_leds = presence_levels(live, self.led_pins)
+            if percent is not None:
+                self._wanted_text = f"{percent:3d}"
+            wait = self._last + self.period - time.monotonic()
+            if wait <= 0:
+                self._commit()
+            elif self._timer is None:
+                self._timer = threading.Timer(wait, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        """Commit any pending state now."""
+        with self._lock:
+            self._commit()
+
+    def _commit(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._last = time.monotonic()
+        for dev, wanted in ((self.leds, self._wanted_leds), (self.sevenseg, self._wanted_text)):
+            if dev is None or wanted is None:
+                continue
+            name = type(dev).__name__
+            try:
+                self.writes += dev.apply(wanted)
+                self._errors.pop(name, None)
+            except Exception as e:
+                dev.invalidate()
+                if self._errors.get(name) != repr(e):  # one report per distinct failure, not per update
+                    print(f"Output write failed ({name}): {e}")
+                    traceback.print_exc()
+                    self._errors[name] = repr(e)
+        self._wanted_leds = self._wanted_text = None
+
+    def close(self):
+        self.flush()
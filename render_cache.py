@@ -0,0 +1,106 @@
+# render_cache.py
+# Content-addressed on-disk caches of rendered cats (SVG, full PNG, display PNG, frame)
+# and of AI images (same layout, own directory and size budget).
+import hashlib, json, os, shutil
+from pathlib import Path
+
+from config import RENDER_CACHE_DIR, RENDER_CACHE_MAX_BYTES
+from genotype import genotype_mask
+
+# Bump whenever fallback_svg / compose_svg / rasterize settings change output.
+RENDERER_VERSION = 3
+
+# Artifact name → file name inside a cache entry
+ARTIFACTS = {"svg": "cat.svg", "png": "cat.png", "display_png": "cat_display.png", "frame": "cat.rgb565"}
+META_NAME = "meta.json"
+
+
+def cache_key(round_id: int, genotype: dict | int, caption: str, method: str = "svg") -> str:
+    """Hash of everything a rendered cat depends on (genotype as a dict or genotype mask)."""
+    blob = json.dumps(
+        {
+            "renderer": RENDERER_VERSION,
+            "method": method,
+            "round_id": round_id,
+            "genotype": genotype if isinstance(genotype, int) else genotype_mask(genotype),
+            "caption": caption,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def ai_cache_key(prompt: str, model: str, size: str) -> str:
+    """AI images depend only on what was asked for, not on round or genotype."""
+    blob = json.dumps({"method": "ai", "model": model, "size": size, "prompt": prompt}, sort_keys=True)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class RenderCache:
+    def __init__(self, root: str | Path = RENDER_CACHE_DIR, max_bytes: int = RENDER_CACHE_MAX_BYTES):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+
+    def _entry(self, key: str) -> Path:
+        return self.root / key
+
+    def contains(self, key: str) -> bool:
+        return (self._entry(key) / META_NAME).exists()
+
+    def restore(self, key: str, **dests: Path) -> bool:
+        """
+        Copy cached artifacts to their published paths, e.g. restore(key, png=PNG_PATH).
+        Destinations the entry has no artifact for are removed so nothing stale is left behind.
+        """
+        entry = self._entry(key)
+        if not (entry / META_NAME).exists():
+            return False
+        for name, dest in dests.items():
+            src = entry / ARTIFACTS[name]
+            dest = Path(dest)
+            if src.exists():
+                # copy + rename so readers never see a half-written file
+                tmp = dest.with_name(f".{dest.name}.tmp")
+                shutil.copyfile(src, tmp)
+                os.replace(tmp, dest)
+            elif dest.exists():
+                dest.unlink()
+        os.utime(entry)  # mark as recently used
+        return True
+
+    def store(self, key: str, **srcs: Path):
+        """Add an entry from freshly rendered files, e.g. store(key, svg=SVG_PATH, png=PNG_PATH)."""
+        entry = self._entry(key)
+        tmp = self.root / f".{key}.tmp{os.getpid()}"
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir()
+        for name, src in srcs.items():
+            if src and Path(src).exists():
+                shutil.copyfile(src, tmp / ARTIFACTS[name])
+        (tmp / META_NAME).write_text(json.dumps({"renderer": RENDERER_VERSION, "artifacts": sorted(srcs)}))
+        shutil.rmtree(entry, ignore_errors=True)
+        os.replace(tmp, entry)
+        self._evict()
+
+    # ----- Size-bounded LRU eviction -----
+    def _entries(self) -> list[tuple[float, int, Path]]:
+        out = []
+        for entry in self.root.iterdir():
+            if not entry.is_dir() or entry.name.startswith("."):
+                continue
+            try:
+                size = sum(f.stat().st_size for f in entry.iterdir())
+                out.append((entry.stat().st_mtime, size, entry))
+            except FileNotFoundError:
+                continue  # evicted by a concurrent writer (e.g. --prerender workers)
+        return out
+
+    def _evict(self):
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
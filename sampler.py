@@ -0,0 +1,149 @@
+# sampler.py
+# Background board acquisition: one thread owns SPI/GPIO reads, consumers read the ring buffer.
+import threading, time, traceback
+from collections import deque
+
+from config import SAMPLER_RATE_HZ, SAMPLER_CAPACITY, SAMPLER_IDLE_SECONDS
+
+SLOTS = ["A", "B", "C", "D", "E"]
+
+
+def compact_state(state: dict) -> tuple:
+    """Hashable (allele, tile_id) per slot in SLOTS order; cheap to store and compare."""
+    return tuple((state[s]["allele"], state[s]["tile_id"]) for s in SLOTS)
+
+
+def expand_state(compact: tuple) -> dict:
+    """Back to the snapshot() shape (without volts) for compute_matches & friends."""
+    return {s: {"allele": allele, "tile_id": tile_id} for s, (allele, tile_id) in zip(SLOTS, compact)}
+
+
+def _call(cb, t, state, prev):
+    try:
+        cb(t, state, prev)
+    except Exception:
+        traceback.print_exc()
+
+
+class BoardSampler:
+    """
+    Samples a GeneBoard at a fixed rate into a ring of (monotonic time, compact state).
+    With edge=True (the board's edge detection running) it instead reads right after
+    each debounced Hall change, plus once every idle_s as a safety net for missed
+    edges, and sleeps in between. Subscribers are called on the sampler thread as
+    cb(t, state, previous) whenever the compact state changes, so keep them quick or
+    hand work off.
+    """
+
+    def __init__(
+        self,
+        board,
+        rate_hz: float = SAMPLER_RATE_HZ,
+        capacity: int = SAMPLER_CAPACITY,
+        edge: bool = False,
+        idle_s: float = SAMPLER_IDLE_SECONDS,
+    ):
+        self.board = board
+        self.period = 1.0 / rate_hz
+        self.edge = edge
+        self.idle_s = idle_s
+        self._ring = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self._subs = []
+        self._notify = threading.Lock()  # orders replay-on-subscribe against live notifications
+        self._last = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="board-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0):
+        self._stop.set()
+        if self.edge:
+            self.board.wake_waiters()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        last = None
+        next_t = time.monotonic()
+        while not self._stop.is_set():
+            version = self.board.hall_version
+            try:
+                compact = compact_state(self.board.read_with_retries())
+            except Exception:
+                traceback.print_exc()
+                compact = None
+            t = time.monotonic()
+            if compact is not None:
+                with self._lock:
+                    self._ring.append((t, compact))
+                if compact != last:
+                    state, prev = expand_state(compact), expand_state(last) if last else None
+                    with self._notify:
+                        with self._lock:
+                            subs = list(self._subs)
+                        for cb in subs:
+                            _call(cb, t, state, prev)
+                        self._last = (t, compact)
+                    last = compact
+            if self.edge:
+                # Sleep until the next debounced edge after this read (or the idle heartbeat)
+                if not self._stop.is_set():
+                    self.board.wait_for_change(self.idle_s, since=version)
+                continue
+            # Fixed-rate schedule; if a read overran, skip ahead rather than burst
+            next_t += self.period
+            if next_t < t:
+                next_t = t + self.period
+            self._stop.wait(next_t - time.monotonic())
+
+    # ----- Consumers -----
+    def latest(self) -> tuple[float, tuple] | None:
+        with self._lock:
+            return self._ring[-1] if self._ring else None
+
+    def latest_state(self) -> dict | None:
+        item = self.latest()
+        return expand_state(item[1]) if item else None
+
+    def window(self, seconds: float) -> list[tuple[float, tuple]]:
+        """Samples from the last `seconds`, oldest first."""
+        cutoff = time.monotonic() - seconds
+        with self._lock:
+            return [item for item in self._ring if item[0] >= cutoff]
+
+    def wait_for_sample(self, timeout: float | None = None) -> dict | None:
+        """Block until at least one sample exists (e.g. right after start())."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while (item := self.latest()) is None:
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            time.sleep(self.period / 2)
+        return expand_state(item[1])
+
+    def subscribe(self, cb):
+        """Register cb(t, state, previous); returns a function that unsubscribes it.
+
+        If a state has already been sampled, cb is called once with it (previous=None)
+        before any later change, so subscribing after start() doesn't miss the board.
+        """
+        with self._notify:
+            with self._lock:
+                self._subs.append(cb)
+            if self._last:
+                t, compact = self._last
+                _call(cb, t, expand_state(compact), None)
+
+        def unsubscribe():
+            with self._lock:
+                if cb in self._subs:
+                    self._subs.remove(cb)
+
+        return unsubscribe
@@ -1,65 +1,145 @@
 # sensors.py
-import time
-import spidev
-import RPi.GPIO as GPIO
+import time, threading, asyncio
+from collections import Counter
 from statistics import mean
-from config import HALL_PINS, LED_PINS, ADC_CHANNEL, ADC_ID_THRESHOLDS
+from config import HALL_PINS, LED_PINS, ADC_CHANNEL, HALL_DEBOUNCE_MS
+from config import ADC_OVERSAMPLE, ADC_SETTLE_SAMPLES, ADC_AGREE_CODES, ADC_FILTER, ADC_TRIM_FRACTION
+from config import BOARD_VOTE_READS, BOARD_MAX_RETRIES, TILE_ID_BY_SLOT, ADC_LUT_PATH, SAMPLER_EDGE
+from calibration import TileDecoder, UNCERTAIN
+from genotype import BoardMask, pack_board
+from outputs import LedBank, presence_levels
+from hardware import LOW, HIGH
+from metrics import METRICS
 
 SLOTS = ["A", "B", "C", "D", "E"]
 
 
+def filter_codes(codes: list[int], how: str = ADC_FILTER) -> int:
+    """Reduce sorted raw ADC codes to one integer code ("median" or "trimmed" mean)."""
+    n = len(codes)
+    if how == "median":
+        return codes[n // 2]
+    if how == "trimmed":
+        k = int(n * ADC_TRIM_FRACTION)
+        kept = codes[k : n - k] or codes
+        return (sum(kept) + len(kept) // 2) // len(kept)
+    raise ValueError(f"Unknown ADC filter {how!r}")
+
+
 class GeneBoard:
-    def __init__(self):
-        GPIO.setmode(GPIO.BCM)
-        # Hall sensors
-        for slot, pins in HALL_PINS.items():
-            GPIO.setup(pins["dom"], GPIO.IN, pull_up_down=GPIO.PUD_UP)
-            GPIO.setup(pins["rec"], GPIO.IN, pull_up_down=GPIO.PUD_UP)
-        # LEDs
-        for slot, pins in LED_PINS.items():
-            GPIO.setup(pins["green"], GPIO.OUT, initial=GPIO.LOW)
-            GPIO.setup(pins["red"], GPIO.OUT, initial=GPIO.LOW)
-        # Default LED state: show "needs tile" (red ON)
-        for slot, pins in LED_PINS.items():
-            GPIO.output(pins["green"], GPIO.LOW)
-            GPIO.output(pins["red"], GPIO.HIGH)
-
-        # SPI for MCP3008 on CE0
-        self.spi = spidev.SpiDev()
-        self.spi.open(0, 0)
-        self.spi.max_speed_hz = 1_000_000
+    def __init__(
+        self,
+        backend=None,
+        hall_pins: dict = HALL_PINS,
+        led_pins: dict = LED_PINS,
+        adc_channel: dict = ADC_CHANNEL,
+        lut_path: str = ADC_LUT_PATH,
+    ):
+        """
+        backend: hardware.PiBackend (default: RPi.GPIO + spidev on CE0) or hardware.SimBackend.
+        The pin / channel maps and tile calibration default to config's; stations.py passes
+        each station's own.
+        """
+        with METRICS.span("board.setup"):
+            if backend is None:
+                from hardware import PiBackend
+
+                backend = PiBackend()
+            self.hw = backend
+            self.hall_pins = hall_pins
+            self.led_pins = led_pins
+            self.adc_channel = adc_channel
+            # Hall sensors
+            for slot, pins in hall_pins.items():
+                self.hw.setup_input(pins["dom"])
+                self.hw.setup_input(pins["rec"])
+            # LEDs
+            for slot, pins in led_pins.items():
+                self.hw.setup_output(pins["green"], LOW)
+                self.hw.setup_output(pins["red"], LOW)
+            # Default LED state: show "needs tile" (red ON)
+            for slot, pins in led_pins.items():
+                self.hw.write(pins["green"], LOW)
+                self.hw.write(pins["red"], HIGH)
+            self.leds = LedBank(self.hw.write, presence_levels({slot: {} for slot in led_pins}, led_pins))
+
+            # Prebuilt MCP3008 command frames for read_all_raw()
+            self._adc_cmd = {ch: [1, (8 + ch) << 4, 0] for ch in adc_channel.values()}
+            self.tiles = TileDecoder.load(lut_path)
+
+            # Edge-triggered Hall state (see start_edge_detection)
+            self._edge_cond = None
+            self._edge_stopped = False
+            self._edge_wakeups = 0
+            self._sampler_edge = False  # edge detection was started by start_sampler()
+            self._alleles = {}
+            self._hall_version = 0
+            self._debounce_timers = {}
+
+        self.sampler = None
 
     def close(self):
-        try:
-            self.spi.close()
-        finally:
-            GPIO.cleanup()
+        self.stop_sampler()
+        self.stop_edge_detection()
+        self.hw.close()
 
     # ----- ADC helpers -----
     def _read_adc_raw(self, ch: int) -> int:
-        r = self.spi.xfer2([1, (8 + ch) << 4, 0])
+        r = self.hw.xfer([1, (8 + ch) << 4, 0])
         return ((r[1] & 3) << 8) | r[2]  # 0..1023
 
     def _adc_to_volts(self, raw: int) -> float:
         return 3.3 * raw / 1023.0
 
+    def read_all_raw(
+        self,
+        slots: list[str] = SLOTS,
+        oversample: int = ADC_OVERSAMPLE,
+        how: str = ADC_FILTER,
+        settle: int = ADC_SETTLE_SAMPLES,
+    ) -> dict:
+        """
+        Acquire all requested channels in back-to-back passes; returns filtered raw codes.
+        The MCP3008 needs CS toggled per conversion, so every sample is one xfer2 and
+        the transfers are the cost: after `settle` passes a channel whose codes already
+        agree within ADC_AGREE_CODES is done, and only noisy ones are sampled on, up to
+        `oversample`. Frames are prebuilt, channels interleaved (drift hits every slot
+        alike) and everything stays in integer codes until the caller converts.
+        """
+        codes = {slot: [] for slot in slots}
+        pending = [(self._adc_cmd[self.adc_channel[s]], codes[s]) for s in slots]
+        xfer = self.hw.xfer
+        with METRICS.span("board.adc"):
+            for n in range(1, oversample + 1):
+                for cmd, out in pending:
+                    r = xfer(cmd)
+                    out.append(((r[1] & 3) << 8) | r[2])
+                if n >= settle:
+                    pending = [(cmd, out) for cmd, out in pending if max(out) - min(out) > ADC_AGREE_CODES]
+                    if not pending:
+                        break
+        return {slot: filter_codes(sorted(c), how) for slot, c in codes.items()}
+
+    def read_all_voltages(self, slots: list[str] = SLOTS, oversample: int = ADC_OVERSAMPLE) -> dict:
+        raw = self.read_all_raw(slots, oversample)
+        return {slot: round(self._adc_to_volts(code), 3) for slot, code in raw.items()}
+
     def read_slot_voltage(self, slot: str, samples: int = 5) -> float:
-        ch = ADC_CHANNEL[slot]
-        vals = [self._adc_to_volts(self._read_adc_raw(ch)) for _ in range(samples)]
-        return round(mean(vals), 3)
+        return self.read_all_voltages([slot], samples)[slot]
+
+    def decode_tile_raw(self, slot: str, raw: int) -> str | None:
+        """Tile label, None (no tile) or "uncertain", straight from a raw ADC code."""
+        return self.tiles.decode(slot, raw)
 
     def decode_tile_id(self, slot: str, volts: float) -> str | None:
-        table = sorted(ADC_ID_THRESHOLDS.get(slot, []), key=lambda x: x[0])
-        for max_v, label in table:
-            if volts <= (max_v + 0.03):  # small hysteresis
-                return label
-        return None
+        raw = min(1023, max(0, int(volts * 1023.0 / 3.3 + 0.5)))
+        return self.decode_tile_raw(slot, raw)
 
     # ----- Hall sensors -----
     def read_allele(self, slot: str) -> str | None:
-        pins = HALL_PINS[slot]
-        dom_active = GPIO.input(pins["dom"]) == GPIO.LOW
-        rec_active = GPIO.input(pins["rec"]) == GPIO.LOW
+        pins = self.hall_pins[slot]
+        dom_active = self.hw.read(pins["dom"]) == LOW
+        rec_active = self.hw.read(pins["rec"]) == LOW
         if dom_active and not rec_active:
             return "dom"
         if rec_active and not dom_active:
@@ -68,40 +148,287 @@ class GeneBoard:
             return None
         return "invalid"
 
+    # ----- Edge-triggered Hall mode -----
+    def start_edge_detection(self, debounce_ms: int = HALL_DEBOUNCE_MS):
+        """
+        Track all Hall pins via GPIO edge interrupts instead of polling.
+        Each edge (re)arms a per-slot timer; the slot is re-read once its pins
+        have been quiet for debounce_ms, so contact bounce collapses to one update.
+        """
+        if self._edge_cond is not None:
+            return
+        self._debounce_s = debounce_ms / 1000.0
+        self._edge_stopped = False
+        self._edge_cond = threading.Condition()
+        self._alleles = {slot: self.read_allele(slot) for slot in SLOTS}
+        for slot, pins in self.hall_pins.items():
+            for pin in (pins["dom"], pins["rec"]):
+                self.hw.watch(pin, lambda _pin, s=slot: self._on_hall_edge(s))
+
+    def stop_edge_detection(self):
+        if self._edge_cond is None:
+            return
+        for pins in self.hall_pins.values():
+            for pin in (pins["dom"], pins["rec"]):
+                self.hw.unwatch(pin)
+        with self._edge_cond:
+            for t in self._debounce_timers.values():
+                t.cancel()
+            self._debounce_timers.clear()
+            # Set under the lock, before waking: waiters re-check this, not _edge_cond
+            self._edge_stopped = True
+            self._edge_cond.notify_all()
+        self._edge_cond = None
+
+    def _on_hall_edge(self, slot: str):
+        # Runs on the GPIO callback thread: keep it short, just re-arm the debounce timer.
+        cond = self._edge_cond
+        if cond is None:
+            return
+        with cond:
+            old = self._debounce_timers.get(slot)
+            if old:
+                old.cancel()
+            t = threading.Timer(self._debounce_s, self._settle_slot, args=(slot,))
+            t.daemon = True
+            self._debounce_timers[slot] = t
+            t.start()
+
+    def _settle_slot(self, slot: str):
+        cond = self._edge_cond
+        if cond is None:
+            return
+        allele = self.read_allele(slot)
+        with cond:
+            if allele != self._alleles.get(slot):
+                self._alleles[slot] = allele
+                self._hall_version += 1
+                cond.notify_all()
+
+    @property
+    def hall_version(self) -> int:
+        """Bumped on every debounced allele change; pass to wait_for_change(since=...)."""
+        return self._hall_version
+
+    def alleles(self) -> dict:
+        """Current alleles per slot: from the edge-tracked state if enabled, else a fresh read."""
+        if self._edge_cond is None:
+            return {slot: self.read_allele(slot) for slot in SLOTS}
+        with self._edge_cond:
+            return dict(self._alleles)
+
+    def wait_for_change(self, timeout: float | None = None, since: int | None = None) -> dict | None:
+        """
+        Block until the board state changes after version `since` (default: now), edge
+        detection stops, or wake_waiters() is called. Returns the alleles, or None on
+        timeout. Requires start_edge_detection().
+        """
+        cond = self._edge_cond
+        if cond is None:
+            raise RuntimeError("wait_for_change() needs start_edge_detection() first")
+        with cond:
+            seen = self._hall_version if since is None else since
+            wakeups = self._edge_wakeups
+            if not cond.wait_for(
+                lambda: self._hall_version != seen or self._edge_stopped or self._edge_wakeups != wakeups, timeout
+            ):
+                return None
+            return dict(self._alleles)
+
+    def wake_waiters(self):
+        """Return every blocked wait_for_change() now (e.g. a sampler that is stopping)."""
+        cond = self._edge_cond
+        if cond is None:
+            return
+        with cond:
+            self._edge_wakeups += 1
+            cond.notify_all()
+
+    async def changed(self, timeout: float | None = None, since: int | None = None) -> dict | None:
+        """Awaitable wait_for_change() for asyncio callers."""
+        if since is None:
+            since = self._hall_version
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.wait_for_change, timeout, since)
+
+    # ----- Background sampler -----
+    def start_sampler(self, rate_hz: float | None = None, capacity: int | None = None, edge: bool = SAMPLER_EDGE):
+        """
+        Start (or return) the background acquisition thread. Once running, read board
+        state from self.sampler (latest_state/window/subscribe) instead of calling
+        snapshot() from several places, so only one thread ever touches SPI/GPIO.
+        With edge=True the sampler sleeps until a debounced Hall edge instead of polling
+        at rate_hz; if the GPIO backend can't watch edges it falls back to polling.
+        """
+        from sampler import BoardSampler
+
+        if self.sampler is None:
+            if edge and self._edge_cond is None:
+                try:
+                    self.start_edge_detection()
+                    self._sampler_edge = True
+                except Exception as e:
+                    print(f"Edge detection unavailable, polling instead: {e}")
+                    self.stop_edge_detection()
+                    edge = False
+            kwargs = {k: v for k, v in (("rate_hz", rate_hz), ("capacity", capacity)) if v is not None}
+            self.sampler = BoardSampler(self, edge=edge and self._edge_cond is not None, **kwargs)
+        self.sampler.start()
+        return self.sampler
+
+    def stop_sampler(self):
+        if self.sampler is not None:
+            self.sampler.stop()
+            self.sampler = None
+        if self._sampler_edge:
+            self._sampler_edge = False
+            self.stop_edge_detection()
+
     # ----- One-shot read of all slots -----
     def snapshot(self) -> dict:
+        with METRICS.span("board.snapshot"):
+            return self._snapshot()
+
+    def _snapshot(self) -> dict:
         data = {}
+        current = self.alleles()
+        # Only sample ADC for slots with a tile present (dom/rec), all in one pass
+        present = [slot for slot in SLOTS if current[slot] in ("dom", "rec")]
+        raw = self.read_all_raw(present) if present else {}
         for slot in SLOTS:
-            allele = self.read_allele(slot)
-            # Only sample ADC if a tile is present (dom/rec)
-            volts = self.read_slot_voltage(slot) if allele in ("dom", "rec") else 0.0
-            tile_id = self.decode_tile_id(slot, volts) if allele in ("dom", "rec") else None
-            data[slot] = {"allele": allele, "volts": volts, "tile_id": tile_id}
+            if slot in raw:
+                volts = round(self._adc_to_volts(raw[slot]), 3)
+                tile_id = self.decode_tile_raw(slot, raw[slot])
+            else:
+                volts, tile_id = 0.0, None
+            data[slot] = {"allele": current[slot], "volts": volts, "tile_id": tile_id}
         return data
 
+    # ----- Stable read of all slots -----
+    def read_with_retries(
+        self, reads: int = BOARD_VOTE_READS, max_retries: int = BOARD_MAX_RETRIES, interval: float = 0.002
+    ) -> dict:
+        """
+        Majority-voted board reading. Every unsettled slot gets one Hall read per pass
+        and settles as soon as one value holds a strict majority of `reads`, so a quiet
+        board costs ceil(reads / 2) passes. An 'invalid' majority or a split vote
+        restarts that slot's vote, up to max_retries times. The ADC is then read once
+        for all seated slots; an "uncertain" tile ID re-reads within the same budget.
+        Same shape as snapshot(), plus "confidence" (winning vote share), "reads" and "retries".
+        """
+        with METRICS.span("board.read"):
+            data = self._vote_and_decode(reads, max_retries, interval)
+        if METRICS.enabled:
+            METRICS.incr("board_retries", sum(d["retries"] for d in data.values()))
+            METRICS.incr("board_invalid_slots", sum(d["allele"] == "invalid" for d in data.values()))
+        return data
+
+    def _vote_and_decode(self, reads: int, max_retries: int, interval: float) -> dict:
+        need = reads // 2 + 1
+        retries = dict.fromkeys(SLOTS, 0)
+        nreads = dict.fromkeys(SLOTS, 0)
+        settled = {}
+        if self._edge_cond is not None:
+            # Edge mode already debounces: the tracked state is the vote
+            settled = {slot: (allele, 1.0) for slot, allele in self.alleles().items()}
+        votes = {slot: Counter() for slot in SLOTS if slot not in settled}
+        invalid_reads = 0
+        while votes:
+            for slot, v in votes.items():
+                allele = self.read_allele(slot)
+                v[allele] += 1
+                nreads[slot] += 1
+                if allele == "invalid":
+                    invalid_reads += 1
+            for slot, v in list(votes.items()):
+                allele, n = v.most_common(1)[0]
+                total = sum(v.values())
+                if n >= need and allele != "invalid":
+                    settled[slot] = (allele, n / total)
+                elif n >= need or total >= reads:
+                    if retries[slot] < max_retries:
+                        retries[slot] += 1
+                        v.clear()
+                        continue
+                    settled[slot] = (allele, n / total)
+                else:
+                    continue
+                del votes[slot]
+            if votes and interval:
+                time.sleep(interval)
+
+        present = [slot for slot in SLOTS if settled[slot][0] in ("dom", "rec")]
+        raw = self.read_all_raw(present) if present else {}
+        tiles = {slot: self.decode_tile_raw(slot, code) for slot, code in raw.items()}
+        METRICS.incr("board_invalid_reads", invalid_reads)
+        unsure = [slot for slot in present if tiles[slot] == UNCERTAIN and retries[slot] < max_retries]
+        while unsure:
+            METRICS.incr("tile_rereads", len(unsure))
+            for slot, code in self.read_all_raw(unsure).items():
+                retries[slot] += 1
+                raw[slot] = code
+                tiles[slot] = self.decode_tile_raw(slot, code)
+            unsure = [slot for slot in unsure if tiles[slot] == UNCERTAIN and retries[slot] < max_retries]
+
+        data = {}
+        for slot in SLOTS:
+            allele, confidence = settled[slot]
+            data[slot] = {
+                "allele": allele,
+                "volts": round(self._adc_to_volts(raw[slot]), 3) if slot in raw else 0.0,
+                "tile_id": tiles.get(slot),
+                "confidence": round(confidence, 3),
+                "reads": nreads[slot],
+                "retries": retries[slot],
+            }
+        return data
+
+    def read_mask(self, **kwargs) -> BoardMask:
+        """read_with_retries() packed into bitmasks (genotype.py), for scoring or storage."""
+        return pack_board(self.read_with_retries(**kwargs))
+
     # ----- Presence-only LEDs -----
-    def update_leds_presence(self, live: dict):
+    def update_leds_presence(self, live: dict) -> int:
         """
         Green ON if a tile is present and properly seated (allele == dom/rec).
-        Red ON otherwise (empty or invalid).
+        Red ON otherwise (empty or invalid). Only pins that change are written;
+        returns how many were.
         """
-        for slot, info in live.items():
-            g = LED_PINS[slot]["green"]
-            r = LED_PINS[slot]["red"]
-            allele = info.get("allele")
-            if allele in ("dom", "rec"):
-                GPIO.output(g, GPIO.HIGH)
-                GPIO.output(r, GPIO.LOW)
-            else:
-                GPIO.output(g, GPIO.LOW)
-                GPIO.output(r, GPIO.HIGH)
+        return self.leds.apply(presence_levels(live, self.led_pins))
 
     # ----- Simple calibration helper -----
-    def calibrate_adc(self, slot: str, seconds: int = 3):
+    def calibrate_adc(self, slot: str, seconds: int = 3) -> list[int]:
+        """Collect unfiltered raw codes for the seated tile; see calibration.py for building tables."""
         print(f"[Calibrate] Hold the tile for slot {slot} in place for {seconds}s …")
-        vals = []
+        codes = []
         t0 = time.time()
         while time.time() - t0 < seconds:
-            vals.append(self.read_slot_voltage(slot, samples=3))
-            time.sleep(0.05)
-        print(f"Slot {slot}: avg={mean(vals):.3f} V  min={min(vals):.3f}  max={max(vals):.3f}")
+            codes.append(self.read_all_raw([slot], oversample=1)[slot])
+            time.sleep(0.01)
+        vals = [self._adc_to_volts(c) for c in codes]
+        print(
+            f"Slot {slot}: avg={mean(vals):.3f} V  min={min(vals):.3f}  max={max(vals):.3f}"
+            f"  (raw {min(codes)}..{max(codes)}, n={len(codes)})"
+        )
+        return codes
+
+
+def serialize_board_state(state: dict) -> dict:
+    """
+    JSON-friendly view of snapshot()/read_with_retries() output. Alleles become strings
+    ("dom", "rec", "invalid", "empty"); "label" is the tile ID expected for that allele
+    (TILE_ID_BY_SLOT) and "tile_ok" says whether the seated tile matches it.
+    """
+    out = {}
+    for slot, info in state.items():
+        allele = info.get("allele")
+        label = TILE_ID_BY_SLOT[slot].get(allele, "-")
+        out[slot] = {
+            "allele": allele or "empty",
+            "label": label,
+            "tile_id": info.get("tile_id"),
+            "tile_ok": info.get("tile_id") == label,
+            "volts": info.get("volts", 0.0),
+            "confidence": info.get("confidence", 1.0),
+        }
+    return out
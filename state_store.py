@@ -0,0 +1,180 @@
+# state_store.py
+# Crash-safe game state and output publishing: every file is written to a temp name
+# and renamed into place, so readers see the old version or the new one, never half.
+import json, os
+from datetime import datetime
+from pathlib import Path
+
+MANIFEST_VERSION = 1
+
+
+def _fsync_dir(directory: Path):
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def atomic_write(path: str | Path, data: bytes | str, fsync: bool = True):
+    """Write via temp file + rename; with fsync, the data and the rename survive power loss."""
+    path = Path(path)
+    tmp = path.with_name(f".{path.name}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(data.encode("utf-8") if isinstance(data, str) else data)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp, path)
+    if fsync:
+        _fsync_dir(path.parent)
+
+
+def staged_paths(paths: dict) -> dict:
+    """Temp names next to each published path, for rendering into before publish_files()."""
+    return {name: Path(p).with_name(f".{Path(p).name}.staged") for name, p in paths.items()}
+
+
+def publish_files(staged: dict, paths: dict):
+    """Rename staged files over their published paths; a missing staged file removes the old one."""
+    for name, dest in paths.items():
+        src = staged[name]
+        if os.path.exists(src):
+            os.replace(src, dest)
+        else:
+            Path(dest).unlink(missing_ok=True)
+
+
+def _stamp(path: Path):
+    try:
+        st = path.stat()
+        return (st.st_mtime_ns, st.st_size)
+    except FileNotFoundError:
+        return None
+
+
+class StateStore:
+    """
+    game_state.json, parsed once and re-read only when another process changed it.
+    Changes are tracked per field and written by flush() in one fsync'd atomic rename
+    (nothing is written if nothing changed). Read it like a dict.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self._data = {}
+        self._dirty = set()
+        self._stamp = False  # never loaded
+
+    def load(self) -> "StateStore":
+        stamp = _stamp(self.path)
+        if self._dirty or stamp == self._stamp:
+            return self
+        try:
+            self._data = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            self._data = {}
+        self._stamp = stamp
+        return self
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __contains__(self, key) -> bool:
+        return key in self._data
+
+    def get(self, key, default=None):
+        return self._data.get(key, default)
+
+    def as_dict(self) -> dict:
+        return dict(self._data)
+
+    def update(self, **fields):
+        for key, value in fields.items():
+            if self._data.get(key) != value or key not in self._data:
+                self._data[key] = value
+                self._dirty.add(key)
+
+    def replace(self, data: dict):
+        """Start over with `data` (e.g. a new round); dropped fields count as changes too."""
+        self._dirty |= set(self._data) | set(data)
+        self._data = dict(data)
+
+    @property
+    def dirty(self) -> set:
+        return set(self._dirty)
+
+    def flush(self) -> bool:
+        """Persist pending changes; True if anything was written."""
+        if not self._dirty:
+            return False
+        atomic_write(self.path, json.dumps(self._data, indent=2))
+        self._dirty.clear()
+        self._stamp = _stamp(self.path)
+        return True
+
+
+class Manifest:
+    """
+    manifest.json lists the artifacts of the latest published cat with a generation
+    counter that increases on every publish. It is written last, so once a reader
+    sees generation N, every file of generation N is complete; readers that already
+    handled N can skip re-reading anything (see ManifestReader).
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.generation = None  # loaded on first publish
+
+    def publish(self, artifacts: dict, **info) -> int:
+        """artifacts: name → path of files already in place. Returns the new generation."""
+        if self.generation is None:
+            self.generation = read_manifest(self.path).get("generation", 0)
+        self.generation += 1
+        files = {}
+        for name, p in artifacts.items():
+            stamp = _stamp(Path(p))
+            if stamp:
+                files[name] = {"path": str(p), "mtime_ns": stamp[0], "size": stamp[1]}
+        doc = {
+            "version": MANIFEST_VERSION,
+            "generation": self.generation,
+            "published": datetime.now().isoformat(),
+            "artifacts": files,
+            **info,
+        }
+        atomic_write(self.path, json.dumps(doc, indent=2))
+        return self.generation
+
+
+def read_manifest(path: str | Path) -> dict:
+    """The manifest, or {} if missing or unreadable."""
+    try:
+        return json.loads(Path(path).read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+class ManifestReader:
+    """
+    Reader side (display_cat.py): parses manifest.json only when the file changed, and
+    poll() only reports new generations.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.doc = {}
+        self.generation = 0
+        self._stamp = None
+
+    def poll(self) -> dict | None:
+        """The manifest if a newer generation was published since the last poll(), else None."""
+        stamp = _stamp(self.path)
+        if stamp is None or stamp == self._stamp:
+            return None
+        self._stamp = stamp
+        doc = read_manifest(self.path)
+        if doc.get("generation", 0) == self.generation:
+            return None
+        self.doc, self.generation = doc, doc.get("generation", 0)
+        return doc
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+# stations.py
+# Several gene boards ("stations") served by one process. Each station has its own pin
+# and ADC maps, tile calibration, game state and target, and output directory (cat,
+# cat_of_the_day.json, manifest, history). Every board is sampled on its own thread;
+# one scheduler loop reacts to all of them, and a shared pool of render processes
+# renders each distinct (round, genotype) cat once, however many stations show it.
+#   python3 stations.py                        # STATIONS from config.py
+#   python3 stations.py --sim 4 --seconds 60   # four simulated stations under busy play
+#   python3 stations.py --trigger              # nightly round logic in a running instance
+import argparse, json, os, queue, signal, threading, time
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+
+from config import STATIONS, STATION_RENDER_WORKERS, STATIONS_SOCKET
+from config import HALL_PINS, LED_PINS, ADC_CHANNEL, ADC_LUT_PATH
+from framebuffer import dirty_record
+from genotype import genotype_dict, genotype_mask, pack_board
+from render_cache import RenderCache, cache_key
+from state_store import StateStore, Manifest, atomic_write
+import generate_cat
+
+ARTIFACTS = {"svg": "cat.svg", "png": "cat.png", "display_png": "cat_display.png", "frame": "cat.rgb565"}
+
+
+def _sevenseg(where: list | None):
+    # Optional per-station MAX7219 on [bus, device]
+    if not where:
+        return None
+    try:
+        import spidev
+        from outputs import SevenSegment
+
+        spi = spidev.SpiDev()
+        spi.open(*where)
+        spi.max_speed_hz = 1_000_000
+        return SevenSegment(spi.xfer2)
+    except Exception as e:
+        print(f"max7219 {where} unavailable: {e}")
+        return None
+
+
+class Station:
+    """One gene board and everything it publishes, under its own output directory."""
+
+    def __init__(self, spec: dict, backend=None):
+        from history import History
+        from outputs import OutputDriver
+        from sensors import GeneBoard
+
+        self.name = spec["name"]
+        self.out = Path(spec.get("out_dir") or Path("output/stations") / self.name)
+        self.out.mkdir(parents=True, exist_ok=True)
+        self.paths = {name: self.out / filename for name, filename in ARTIFACTS.items()}
+        self.json_path = self.out / "cat_of_the_day.json"
+        self.store = StateStore(self.out / "game_state.json")
+        self.manifest = Manifest(self.out / "manifest.json")
+        self.history = History(self.out / "history")
+        if backend is None:
+            from hardware import PiBackend
+
+            backend = PiBackend(spec.get("spi_bus", 0), spec.get("spi_device", 0))
+        self.board = GeneBoard(
+            backend,
+            spec.get("hall_pins", HALL_PINS),
+            spec.get("led_pins", LED_PINS),
+            spec.get("adc_channel", ADC_CHANNEL),
+            spec.get("lut_path", ADC_LUT_PATH),
+        )
+        self.outputs = OutputDriver(self.board.leds, _sevenseg(spec.get("sevenseg")), led_pins=self.board.led_pins)
+        self.state, self.round = generate_cat.load_round_state(self.store)
+        self.state.flush()
+        self.live = None
+        self.percent, self.matches = 0, {}
+        self.shown = None  # (round id, genotype mask) of the published cat
+        self.wanted = None  # the same, while its render is in flight
+        self.kind = "live"  # history kind of the next publish
+        self.published = 0
+        self._frame = None
+
+    def progress(self, live: dict) -> tuple[int, int]:
+        """LEDs, 7-seg and game state for a new reading; returns the (round id, genotype mask) to show."""
+        self.live = live
+        self.percent, self.matches = generate_cat.compute_matches(live, self.state["target_genotype"])
+        self.outputs.show(live, self.percent)
+        if self.percent == 100 and not self.state.get("advance_on_next_run"):
+            self.state.update(current_round_id=self.round["id"], advance_on_next_run=True)
+        self.state.flush()
+        return self.round["id"], genotype_mask(generate_cat.allele_genotype(live))
+
+    def nightly(self):
+        self.state, self.round = generate_cat.load_round_state(self.store)
+        self.state.flush()
+        self.shown = self.wanted = None  # always publish a fresh cat of the day
+        self.kind = "nightly"
+
+    def publish(self, key: str) -> bool:
+        """Copy the cat for cache key `key` into place and publish summary, manifest and history."""
+        dirty = dirty_record(self._frame, None)
+        self._frame = dirty["id"]
+        if not RenderCache().restore(key, **self.paths):
+            return False  # evicted since it was rendered
+        live = self.live
+        labels = generate_cat.resolve_trait_labels(generate_cat.allele_genotype(live), self.round)
+        payload = generate_cat.cat_payload(
+            self.round,
+            live,
+            labels,
+            generate_cat.render_method(),
+            self.percent,
+            self.matches,
+            self.state,
+            self.paths["png"],
+            self.paths["svg"],
+        )
+        payload["station"] = self.name
+        atomic_write(self.json_path, json.dumps(payload, indent=2))
+        artifacts = {**self.paths, "json": self.json_path}
+        self.manifest.publish(
+            artifacts, round_id=self.round["id"], method=payload["method"], station=self.name, dirty=dirty
+        )
+        board = pack_board(live)
+        self.history.append(payload, board.genotype, board.to_int(), self.kind, png=self.paths["display_png"])
+        self.kind = "live"
+        self.published += 1
+        return True
+
+    def status(self) -> dict:
+        return {
+            "round_id": self.round["id"],
+            "progress_percent": self.percent,
+            "generation": self.manifest.generation,
+            "published": self.published,
+        }
+
+    def close(self):
+        try:
+            self.outputs.close()
+        finally:
+            self.board.close()
+
+
+class RenderPool:
+    """
+    Worker processes shared by all stations, rendering into the RenderCache. Requests
+    for the same cat (same cache key) while it is being rendered join that one job.
+    """
+
+    def __init__(self, workers: int = STATION_RENDER_WORKERS):
+        self._pool = ProcessPoolExecutor(max_workers=workers)
+        self._jobs = {}  # cache key → Future
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "rendered": 0, "shared": 0, "cached": 0}
+
+    def request(self, round_cfg: dict, genotype: dict, on_done) -> str:
+        """Make sure the cat is cached; on_done(cache key, exception or None) runs when it is."""
+        caption = generate_cat.caption_for(round_cfg)
+        key = cache_key(round_cfg["id"], genotype, caption, method=generate_cat.render_method())
+        new = False
+        with self._lock:
+            self.stats["requests"] += 1
+            fut = self._jobs.get(key)
+            if fut is not None:
+                self.stats["shared"] += 1
+            elif RenderCache().contains(key):
+                self.stats["cached"] += 1
+                fut = Future()
+                fut.set_result(None)
+            else:
+                self.stats["rendered"] += 1
+                fut = self._pool.submit(generate_cat.render_to_cache, round_cfg["id"], genotype)
+                self._jobs[key] = fut
+                new = True
+        # Outside the lock: callbacks of an already finished job run right here
+        if new:
+            fut.add_done_callback(lambda f, k=key: self._forget(k, f))
+        fut.add_done_callback(lambda f: on_done(key, f.exception()))
+        return key
+
+    def _forget(self, key: str, fut: Future):
+        with self._lock:
+            if self._jobs.get(key) is fut:
+                del self._jobs[key]
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+# ---------- Scheduler ----------
+def _next_batch(events: queue.Queue, timeout: float | None) -> list[tuple]:
+    """Everything queued (waiting up to `timeout` for the first); board changes collapse to the newest per station."""
+    try:
+        batch = [events.get(timeout=timeout)]
+    except queue.Empty:
+        return []
+    while True:
+        try:
+            batch.append(events.get_nowait())
+        except queue.Empty:
+            break
+    boards, rest = {}, []
+    for kind, data in batch:
+        if kind == "board":
+            boards[data[0].name] = (kind, data)
+        else:
+            rest.append((kind, data))
+    return list(boards.values()) + rest
+
+
+def run_stations(
+    stations: list[Station], pool: RenderPool, seconds: float | None = None, socket_path: str | None = STATIONS_SOCKET
+) -> dict:
+    """
+    Serve all stations until "quit" (or for `seconds`). A board change updates that
+    station's LEDs, 7-seg and progress right away and asks the pool for its cat; when
+    the render lands, the station publishes it if its board still shows that genotype.
+    "nightly" (SIGUSR1 or the control socket) runs the round logic for every station.
+    Returns event / publish counts.
+    """
+    events = queue.Queue()
+    status = {"pid": os.getpid(), "stations": {}}
+    stats = {"board_changes": 0, "published": 0, "stale_renders": 0}
+
+    def want(st: Station, key: tuple[int, int]):
+        st.wanted = key
+        pool.request(st.round, genotype_dict(key[1]), lambda ck, err: events.put(("rendered", (st, key, ck, err))))
+
+    def on_board(st: Station, live: dict):
+        stats["board_changes"] += 1
+        key = st.progress(live)
+        if key == st.shown:
+            st.wanted = None  # back to the cat on screen: drop any render in flight
+        elif key != st.wanted:
+            want(st, key)
+
+    for st in stations:
+        sampler = st.board.start_sampler()
+        # replays the board sampled so far, so every station shows its cat without a tile moving
+        sampler.subscribe(lambda t, live, prev, st=st: events.put(("board", (st, live))))
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGUSR1, lambda *_: events.put(("nightly", None)))
+        signal.signal(signal.SIGTERM, lambda *_: events.put(("quit", None)))
+        signal.signal(signal.SIGINT, lambda *_: events.put(("quit", None)))
+    server = generate_cat._start_control_socket(events, status, socket_path) if socket_path else None
+    end = None if seconds is None else time.monotonic() + seconds
+    try:
+        while end is None or time.monotonic() < end:
+            for kind, data in _next_batch(events, None if end is None else max(0.0, end - time.monotonic())):
+                if kind == "quit":
+                    return stats
+                if kind == "board":
+                    on_board(*data)
+                elif kind == "nightly":
+                    for st in stations:
+                        st.nightly()
+                        live = st.board.sampler.latest_state() or st.board.sampler.wait_for_sample(1.0)
+                        if live:
+                            on_board(st, live)
+                elif kind == "rendered":
+                    st, key, ck, err = data
+                    if key != st.wanted:
+                        stats["stale_renders"] += 1  # board moved on; the cat stays cached
+                    elif err is not None:
+                        print(f"[{st.name}] render failed: {err}")
+                        st.wanted = None
+                    elif st.publish(ck):
+                        st.shown, st.wanted = key, None
+                        stats["published"] += 1
+                    else:
+                        want(st, key)
+                status["stations"] = {st.name: st.status() for st in stations}
+        return stats
+    finally:
+        if server:
+            server.shutdown()
+            server.server_close()
+            Path(socket_path).unlink(missing_ok=True)
+
+
+# ---------- Main ----------
+def sim_stations(count: int, seconds: float) -> list[Station]:
+    """`count` simulated stations (STATIONS[0]'s maps, own output dirs) under scripted busy play."""
+    from board_trace import busy_script
+    from hardware import SimBackend
+
+    base = STATIONS[0]
+    stations = []
+    for i in range(count):
+        spec = {**base, "name": f"sim{i}", "out_dir": f"output/sim/sim{i}", "sevenseg": None}
+        sim = SimBackend(
+            seed=i,
+            hall_pins=spec.get("hall_pins", HALL_PINS),
+            adc_channel=spec.get("adc_channel", ADC_CHANNEL),
+            lut_path=spec.get("lut_path", ADC_LUT_PATH),
+        )
+        stations.append(Station(spec, sim))
+        sim.play(busy_script(seconds, seed=i))
+    return stations
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Serve several gene boards from one process")
+    ap.add_argument("--only", help="Comma-separated station names (default: all in STATIONS)")
+    ap.add_argument("--sim", type=int, metavar="N", help="N simulated stations under busy play instead")
+    ap.add_argument("--seconds", type=float, help="Stop after this long (default: until quit / SIGTERM)")
+    ap.add_argument("--workers", type=int, default=STATION_RENDER_WORKERS, help="Shared render processes")
+    ap.add_argument(
+        "--trigger", nargs="?", const="nightly", help="Send a command (default: nightly) to a running instance"
+    )
+    args = ap.parse_args()
+    if args.trigger:
+        raise SystemExit(0 if generate_cat.trigger_daemon(args.trigger, STATIONS_SOCKET) else 1)
+
+    os.environ.pop("OPENAI_API_KEY", None)  # stations publish the rendered fallback; no AI images
+    if args.sim:
+        stations = sim_stations(args.sim, args.seconds or 30.0)
+        socket_path = None
+    else:
+        names = set(args.only.split(",")) if args.only else None
+        stations = [Station(spec) for spec in STATIONS if names is None or spec["name"] in names]
+        socket_path = STATIONS_SOCKET
+    pool = RenderPool(args.workers)
+    print(f"🐈 Serving {len(stations)} station(s): {', '.join(st.name for st in stations)}")
+    t0 = time.monotonic()
+    try:
+        stats = run_stations(stations, pool, args.seconds or (30.0 if args.sim else None), socket_path)
+    finally:
+        pool.close()
+        for st in stations:
+            st.close()
+    wall = time.monotonic() - t0
+    summary = {**stats, "seconds": round(wall, 1), "render_pool": pool.stats}
+    summary["stations"] = {st.name: st.status() for st in stations}
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()